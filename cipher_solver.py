@@ -0,0 +1,292 @@
+import array
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import add, mul
+from ciphers import CipherEngine, CLASSIC_CIPHERS
+from text_processor import TextProcessor, ALPHABET, SOFIT_FLAG
+
+SIZE = len(ALPHABET)
+
+# Multipliers coprime to 22, i.e. the valid a of an affine map x -> a*x + b
+AFFINE_MULTIPLIERS = tuple(a for a in range(1, SIZE) if math.gcd(a, SIZE) == 1)
+
+# score_keys only starts a process pool for at least this many keys
+POOL_MIN_KEYS = 2000
+
+# Model and passage of each CipherSolver pool worker
+_worker_state = None
+
+
+class NGramModel:
+    """
+    Letter n-gram language model over the 22 letters (sofit forms folded).
+
+    logprob[g] is log10 P(last letter | first n-1 letters) for the n-gram
+    with base-22 code g (first letter most significant), add-one smoothed,
+    so scoring a text is a sum of table lookups.
+    """
+    def __init__(self, logprob, n):
+        self.logprob = logprob
+        self.n = n
+
+    @classmethod
+    def train(cls, codes, n=3):
+        """Counts the n-grams of letter codes (sofit flags are ignored)."""
+        if not 1 <= n <= 5:
+            raise ValueError("n must be between 1 and 5")
+        codes = fold_codes(codes)
+        counts = [0] * SIZE ** n
+        for code in ngram_codes(codes, n):
+            counts[code] += 1
+        logprob = array.array('d', bytes(8 * SIZE ** n))
+        for context in range(SIZE ** (n - 1)):
+            first = context * SIZE
+            row = counts[first:first + SIZE]
+            total = sum(row) + SIZE
+            logprob[first:first + SIZE] = array.array('d', (math.log10((c + 1) / total) for c in row))
+        return cls(logprob, n)
+
+    @classmethod
+    def from_loader(cls, loader, n=3):
+        """Loads the model from the corpus cache, training and saving it the first time."""
+        codes = loader.load_corpus()
+        key = f"ngram{n}.logprob"
+        logprob = loader.cache.load_array(key)
+        if logprob is None:
+            model = cls.train(codes, n)
+            loader.cache.save_arrays({key: model.logprob})
+            return model
+        return cls(logprob, n)
+
+    def score(self, codes):
+        """Total log10 probability of the n-grams of folded letter codes."""
+        return sum(map(self.logprob.__getitem__, ngram_codes(codes, self.n)))
+
+
+def fold_codes(codes):
+    """Letter codes with the sofit flag cleared."""
+    return bytes(codes).translate(bytes(c & ~SOFIT_FLAG if c & ~SOFIT_FLAG < SIZE else c for c in range(256)))
+
+
+def ngram_codes(codes, n):
+    """Base-22 code of every n-gram of the codes (an iterator)."""
+    codes = bytes(codes)
+    last = len(codes) - n + 1
+    grams = codes[:last]
+    for j in range(1, n):
+        grams = map(add, map(SIZE.__mul__, grams), codes[j:j + last])
+    return iter(grams)
+
+
+class CipherSolver:
+    """
+    Ranks substitution keys for a passage by how Hebrew the deciphered text
+    looks to an NGramModel.
+
+    A key maps each cipher letter to a plain letter. The passage is reduced
+    once to its distinct cipher n-grams, stored as one byte column per
+    n-gram position plus their counts. A key is then scored with a few map()
+    calls over those columns (the key's lookup lists turn cipher letters into
+    weighted plain codes, and the n-gram codes index the log-prob table), so
+    the cost per key depends on the number of distinct n-grams, not on the
+    passage length.
+
+    Candidates are every shift, every affine map (a coprime to 22), the
+    classic ciphers and hill-climbed general permutations. Climbs (and large
+    key lists) run in a process pool; each climb has its own seed, so the
+    results do not depend on the number of workers.
+    """
+    def __init__(self, model, workers=None, engine=None):
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine or CipherEngine()
+        self.tp = TextProcessor()
+
+    @classmethod
+    def from_loader(cls, loader, n=3, **kwargs):
+        return cls(NGramModel.from_loader(loader, n), loader.workers, **kwargs)
+
+    def prepare(self, passage):
+        """Distinct cipher n-grams of a passage as (columns, counts)."""
+        codes = self.tp.normalize(passage, "codes_folded")
+        counts = {}
+        n = self.model.n
+        for i in range(len(codes) - n + 1):
+            gram = codes[i:i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+        grams = list(counts)
+        columns = [bytes(gram[j] for gram in grams) for j in range(n)]
+        return columns, array.array('I', counts.values())
+
+    def score(self, passage, key):
+        """log10 probability of the passage deciphered with a key (22-letter string)."""
+        return _score_key(self.model.logprob, self.prepare(passage), key_codes(key))
+
+    def score_keys(self, passage, keys):
+        """Scores of many keys, in order (a process pool is used for long lists)."""
+        grams = self.prepare(passage)
+        keys = [key_codes(key) for key in keys]
+        if self.workers > 1 and len(keys) >= POOL_MIN_KEYS:
+            chunk = -(-len(keys) // (self.workers * 4))
+            chunks = [keys[i:i + chunk] for i in range(0, len(keys), chunk)]
+            with self._pool(grams) as pool:
+                return [s for part in pool.map(_score_chunk, chunks) for s in part]
+        return [_score_key(self.model.logprob, grams, key) for key in keys]
+
+    def _pool(self, grams):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.model.logprob, grams))
+
+    def fixed_candidates(self):
+        """[(kind, name, key)] for every shift, affine map and classic cipher."""
+        candidates = []
+        for a in AFFINE_MULTIPLIERS:
+            for b in range(SIZE):
+                # Encryption is x -> a*x + b, the key maps each image back to x
+                plain = [0] * SIZE
+                for x in range(SIZE):
+                    plain[(a * x + b) % SIZE] = x
+                if a == 1:
+                    candidates.append(("shift", f"shift {b}", bytes(plain)))
+                else:
+                    candidates.append(("affine", f"affine a={a} b={b}", bytes(plain)))
+        for name in CLASSIC_CIPHERS:
+            candidates.append(("cipher", name, key_codes(self.engine.decipher(ALPHABET, name))))
+        return candidates
+
+    def solve(self, passage, restarts=None, iterations=2000, seed=0, top=5):
+        """
+        Args:
+            restarts (int): Number of hill climbs (default: 2 per worker).
+            iterations (int): Swaps tried per climb.
+            seed (int): Climb r uses seed + r.
+
+        Returns:
+            list: The top candidates, best first, as dicts with 'kind',
+                  'name', 'key' (plain letter of each cipher letter Aleph..Tav,
+                  usable with CipherEngine.register), 'score' and 'text'.
+        """
+        grams = self.prepare(passage)
+        restarts = restarts if restarts is not None else 2 * self.workers
+        fixed = self.fixed_candidates()
+        scored = [(_score_key(self.model.logprob, grams, key), kind, name, key) for kind, name, key in fixed]
+        # The first climb starts from the best fixed key, the others from random keys
+        best_fixed = max(scored)[3]
+        present = sorted(set(b"".join(grams[0])))
+        starts = [best_fixed] + [None] * (restarts - 1) if restarts else []
+        seeds = [seed + r for r in range(restarts)]
+        if self.workers > 1 and restarts > 1:
+            with self._pool(grams) as pool:
+                climbed = list(pool.map(_climb, starts, seeds, repeat(iterations), repeat(present)))
+        else:
+            climbed = [_climb(start, s, iterations, present, (self.model.logprob, grams))
+                       for start, s in zip(starts, seeds)]
+        for r, (score, key) in enumerate(climbed):
+            scored.append((score, "permutation", f"hill climb {seeds[r]}", key))
+
+        scored.sort(key=lambda c: c[0], reverse=True)
+        results = []
+        seen = set()
+        for score, kind, name, key in scored:
+            if key in seen:
+                continue
+            seen.add(key)
+            letters = key.translate(self.tp.letter_table).decode('iso8859_8')
+            results.append({
+                'kind': kind,
+                'name': name,
+                'key': letters,
+                'score': score,
+                'text': self.decipher(passage, letters),
+            })
+            if len(results) == top:
+                break
+        return results
+
+    def decipher(self, passage, key):
+        """The passage letters deciphered with a key."""
+        table = {ord(c): p for c, p in zip(ALPHABET, key)}
+        return self.tp.normalize(passage, "folded").translate(table)
+
+
+def key_codes(key):
+    """A key as 22 bytes of plain letter codes (accepts a 22-letter string or bytes)."""
+    if isinstance(key, str):
+        key = bytes(ALPHABET.index(c) for c in key)
+    if sorted(key) != list(range(SIZE)):
+        raise ValueError("A key must be a permutation of the 22 letters")
+    return bytes(key)
+
+
+def _score_key(logprob, grams, key):
+    columns, counts = grams
+    n = len(columns)
+    codes = None
+    for j, column in enumerate(columns):
+        weight = SIZE ** (n - 1 - j)
+        lookup = [plain * weight for plain in key]
+        part = map(lookup.__getitem__, column)
+        codes = part if codes is None else map(add, codes, part)
+    if codes is None:
+        return 0.0
+    return sum(map(mul, counts, map(logprob.__getitem__, codes)))
+
+
+def _climb(start, seed, iterations, present, state=None):
+    """Hill climb over letter swaps; returns (score, key)."""
+    logprob, grams = state or _worker_state
+    rng = random.Random(seed)
+    key = bytearray(start) if start is not None else bytearray(range(SIZE))
+    if start is None:
+        rng.shuffle(key)
+    best = _score_key(logprob, grams, key)
+    if not present:
+        return best, bytes(key)
+    for _ in range(iterations):
+        # Only letters of the passage change the score, so one side of the swap is one of them
+        i = rng.choice(present)
+        j = rng.randrange(SIZE)
+        if i == j:
+            continue
+        key[i], key[j] = key[j], key[i]
+        score = _score_key(logprob, grams, key)
+        if score > best:
+            best = score
+        else:
+            key[i], key[j] = key[j], key[i]
+    return best, bytes(key)
+
+
+def _init_worker(logprob, grams):
+    global _worker_state
+    _worker_state = (logprob, grams)
+
+
+def _score_chunk(keys):
+    logprob, grams = _worker_state
+    return [_score_key(logprob, grams, key) for key in keys]
+
+
+if __name__ == "__main__":
+    import time
+    from torah_loader import TorahLoader
+    loader = TorahLoader()
+    solver = CipherSolver.from_loader(loader)
+    plain = loader.tp.decode_letters(loader.load_corpus()[1000:1200])
+    passage = solver.engine.encipher(plain, "atbah")
+    print(f"Ciphertext: {passage[:60]}...")
+
+    started = time.time()
+    keys = [bytes(random.Random(i).sample(range(SIZE), SIZE)) for i in range(20000)]
+    solver.score_keys(passage, keys)
+    elapsed = time.time() - started
+    print(f"Scored {len(keys)} random keys in {elapsed:.2f}s ({len(keys) / elapsed:.0f} keys/s)")
+
+    started = time.time()
+    for result in solver.solve(passage, iterations=3000):
+        print(f"{result['score']:10.1f}  {result['kind']:<12} {result['name']:<20} {result['text'][:40]}")
+    print(f"Solved in {time.time() - started:.2f}s")
+    print(f"Plaintext:  {plain[:60]}...")
@@ -1,37 +1,149 @@
+import array
+import hashlib
+import zlib
+from text_processor import ALPHABET, SOFIT_FORMS, SOFIT_FLAG
+
+# Built-in ciphers of CipherEngine (shift0..shift21 are added on top of these)
+CIPHERS = {
+    "atbash": "first letter <-> last letter (Aleph<->Tav, Bet<->Shin, ...)",
+    "albam": "letter <-> letter 11 places on (Aleph<->Lamed, Bet<->Mem, ...)",
+    "atbah": "pairs summing to 10/100 plus He<->Nun and Qof<->Tav (Aleph<->Tet, ...)",
+    "avgad": "each letter -> the next one (Aleph->Bet, ..., Tav->Aleph)",
+    "shiftN": "each letter -> the letter N places on, N = 0..21",
+}
+
+# The traditional named ciphers (albam and avgad are also shift11 and shift1)
+CLASSIC_CIPHERS = ("atbash", "albam", "atbah", "avgad")
+
+ATBAH_PAIRS = ("אט", "בח", "גז", "דו", "הנ", "יצ", "כפ", "לע", "מס", "קת", "רש")
+
+
 class CipherEngine:
+    """
+    Hebrew substitution ciphers compiled to translate tables.
+
+    Every cipher is a permutation of the 22 letters. Registering one compiles
+    it into a str.translate table (sofit forms are enciphered as their regular
+    letter, anything else passes through) and a bytes.translate table over the
+    corpus letter codes, so enciphering a word or the whole Tanakh is a single
+    translate call.
+    """
     def __init__(self):
-        self.alphabet = "אבגדהוזחטיכלמנסעפצקרשת"
-        # Standard Atbash Map
-        # First maps to Last
-        self.atbash_map = {}
-        for i in range(len(self.alphabet)):
-            self.atbash_map[self.alphabet[i]] = self.alphabet[-(i+1)]
-            
-        # Albam Map
-        # Replaces letter with one 11 positions away (mod 22)
-        # Often splits alphabet in half: Aleph-Kaf (1-11) and Lamed-Tav (12-22)
-        self.albam_map = {}
-        half = len(self.alphabet) // 2
-        for i in range(len(self.alphabet)):
-            target_idx = (i + half) % len(self.alphabet)
-            self.albam_map[self.alphabet[i]] = self.alphabet[target_idx]
+        self.alphabet = ALPHABET
+        self.ciphers = {}
+        self._tables = {}
+        self.register("atbash", self.alphabet[::-1])
+        self.register("albam", self.alphabet[11:] + self.alphabet[:11])
+        self.register("atbah", {**dict(ATBAH_PAIRS), **{b: a for a, b in ATBAH_PAIRS}})
+        self.register("avgad", self.alphabet[1:] + self.alphabet[:1])
+        for n in range(len(self.alphabet)):
+            self.register(f"shift{n}", self.alphabet[n:] + self.alphabet[:n])
+
+    def register(self, name, permutation):
+        """
+        Adds a cipher.
+
+        Args:
+            name (str): Cipher name.
+            permutation (str or dict): The images of Aleph..Tav as a 22-letter
+                string, or {letter: image} where unlisted letters map to themselves.
+        """
+        if isinstance(permutation, dict):
+            permutation = "".join(permutation.get(char, char) for char in self.alphabet)
+        if sorted(permutation) != sorted(self.alphabet):
+            raise ValueError(f"Cipher {name} is not a permutation of the 22 letters")
+        self.ciphers[name] = permutation
+        self._tables.pop(name, None)
+
+    def _compile(self, name):
+        if name not in self.ciphers:
+            raise ValueError(f"Unknown cipher: {name} (choose from {', '.join(self.ciphers)})")
+        if name not in self._tables:
+            images = self.ciphers[name]
+            inverse = "".join(self.alphabet[images.index(char)] for char in self.alphabet)
+            text_tables = []
+            for target in (images, inverse):
+                table = {ord(char): target[i] for i, char in enumerate(self.alphabet)}
+                for sofit, regular in SOFIT_FORMS.items():
+                    table[ord(sofit)] = table[ord(regular)]
+                text_tables.append(table)
+            # Codes come out folded: a flagged (sofit) code maps like its regular letter
+            codes = bytearray(range(256))
+            for code in range(len(self.alphabet)):
+                codes[code] = codes[code | SOFIT_FLAG] = self.alphabet.index(images[code])
+            self._tables[name] = (text_tables[0], text_tables[1], bytes(codes))
+        return self._tables[name]
+
+    def encipher(self, text, name):
+        return text.translate(self._compile(name)[0])
+
+    def decipher(self, text, name):
+        """Inverse of encipher (the same for self-inverse ciphers like Atbash)."""
+        return text.translate(self._compile(name)[1])
+
+    def encipher_codes(self, codes, name):
+        """Enciphers letter codes (see text_processor.ALPHABET); sofit forms come out folded."""
+        return bytes(codes).translate(self._compile(name)[2])
 
     def atbash(self, text):
         """Applies Atbash cipher to the text."""
-        result = []
-        for char in text:
-            if char in self.atbash_map:
-                result.append(self.atbash_map[char])
-            else:
-                result.append(char)
-        return "".join(result)
+        return self.encipher(text, "atbash")
 
     def albam(self, text):
         """Applies Albam cipher to the text."""
-        result = []
-        for char in text:
-            if char in self.albam_map:
-                result.append(self.albam_map[char])
-            else:
-                result.append(char)
-        return "".join(result)
+        return self.encipher(text, "albam")
+
+    def corpus_digest(self, codes):
+        return hashlib.sha256(bytes(codes)).hexdigest()[:16]
+
+    def cache_key(self, name, digest):
+        # The corpus digest and the permutation are part of the key, so neither another
+        # text of the same length nor a re-registered name can read stale arrays
+        return f"cipher.{digest}.{name}.{zlib.crc32(self.ciphers[name].encode('iso8859_8')):08x}"
+
+    def transform_corpus(self, codes, names=None, cache=None):
+        """
+        Enciphers the whole corpus under many ciphers (all by default).
+
+        Args:
+            codes: Corpus letter codes, e.g. TorahLoader().load_corpus().
+            cache (CorpusCache): Loads the enciphered codes from it, and saves
+                the ones it did not have (keyed by a digest of codes). Cipher
+                streams of any other text are dropped from it, so it only
+                ever holds those of the last corpus transformed.
+
+        Returns:
+            dict: {cipher name: array('B') of enciphered letter codes}
+        """
+        names = list(names or self.ciphers)
+        codes = bytes(codes)
+        digest = self.corpus_digest(codes) if cache else None
+        result = {}
+        missing = {}
+        for name in names:
+            key = self.cache_key(name, digest) if cache else None
+            cached = cache.load_array(key) if cache else None
+            if cached is None or len(cached) != len(codes):
+                cached = array.array('B', self.encipher_codes(codes, name))
+                if cache:
+                    missing[key] = cached
+            result[name] = cached
+        if cache:
+            current = f"cipher.{digest}."
+            cache.drop_arrays([key for key in cache.array_keys("cipher.") if not key.startswith(current)])
+        if cache and missing:
+            cache.save_arrays(missing)
+        return result
+
+
+if __name__ == "__main__":
+    import time
+    from torah_loader import TorahLoader
+    loader = TorahLoader()
+    codes = loader.load_corpus()
+    engine = CipherEngine()
+    started = time.time()
+    streams = engine.transform_corpus(codes, cache=loader.cache)
+    print(f"{len(streams)} ciphers x {len(codes)} letters in {(time.time() - started) * 1000:.0f} ms")
+    for name in ("atbash", "albam", "atbah", "avgad"):
+        print(f"{name:>7}: {loader.tp.decode_letters(streams[name][:20])}")
@@ -0,0 +1,124 @@
+import array
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+
+class CitationIndex:
+    """
+    Maps offsets in the flattened letter stream back to book/chapter/verse.
+
+    Verses are kept as a sorted table of start offsets with parallel book,
+    chapter and verse columns, and word starts as a second sorted offset table,
+    so every lookup is a bisect and never a rescan of the text.
+    """
+    def __init__(self, book_names, length=0):
+        self.book_names = list(book_names)
+        self.length = length
+        self.verse_starts = array.array('I')
+        self.verse_books = array.array('H')
+        self.verse_chapters = array.array('H')
+        self.verse_numbers = array.array('H')
+        self.word_starts = array.array('I')
+        self._chapter_keys = None
+
+    def add_verse(self, book, chapter, verse, offset):
+        """Appends a verse row. Rows must be added in stream order."""
+        self.verse_starts.append(offset)
+        self.verse_books.append(book)
+        self.verse_chapters.append(chapter)
+        self.verse_numbers.append(verse)
+        self._chapter_keys = None
+
+    def add_word(self, offset):
+        self.word_starts.append(offset)
+
+    def to_arrays(self):
+        """Flattens the tables into arrays for the corpus cache."""
+        verses = array.array('I')
+        for row in zip(self.verse_starts, self.verse_books, self.verse_chapters, self.verse_numbers):
+            verses.extend(row)
+        return {'verses': verses, 'words': self.word_starts}
+
+    @classmethod
+    def from_arrays(cls, book_names, length, verses, words):
+        index = cls(book_names, length)
+        index.verse_starts = array.array('I', verses[0::4])
+        index.verse_books = array.array('H', verses[1::4])
+        index.verse_chapters = array.array('H', verses[2::4])
+        index.verse_numbers = array.array('H', verses[3::4])
+        index.word_starts = words
+        return index
+
+    def book_id(self, book):
+        """Accepts 'genesis', 'Genesis', 'I Samuel' or 'i_samuel'."""
+        key = book.strip().lower().replace(" ", "_")
+        if key not in self.book_names:
+            raise KeyError(f"Unknown book: {book}")
+        return self.book_names.index(key)
+
+    def display_name(self, book_id):
+        fixed = {"i": "I", "ii": "II", "of": "of"}
+        return " ".join(fixed.get(p, p.capitalize()) for p in self.book_names[book_id].split("_"))
+
+    def locate(self, offset):
+        """Returns the verse row that contains the letter at offset."""
+        if not 0 <= offset < self.length:
+            raise IndexError(f"Offset {offset} outside corpus of {self.length} letters")
+        return bisect_right(self.verse_starts, offset) - 1
+
+    def cite(self, offset):
+        """Returns (book, chapter, verse) for a single offset."""
+        row = self.locate(offset)
+        return (self.display_name(self.verse_books[row]), self.verse_chapters[row], self.verse_numbers[row])
+
+    def cite_many(self, offsets):
+        """
+        Bulk version of cite. The bisects run through map(), so millions of
+        offsets are converted without a Python-level loop per lookup.
+        """
+        offsets = list(offsets)
+        if offsets and (min(offsets) < 0 or max(offsets) >= self.length):
+            raise IndexError(f"Offsets must lie within corpus of {self.length} letters")
+        rows = map(bisect_right, repeat(self.verse_starts), offsets)
+        names = [self.display_name(i) for i in range(len(self.book_names))]
+        books, chapters, verses = self.verse_books, self.verse_chapters, self.verse_numbers
+        return [(names[books[r - 1]], chapters[r - 1], verses[r - 1]) for r in rows]
+
+    def annotate(self, hits):
+        """Adds 'book', 'chapter' and 'verse' keys to ELS hit dicts (in place)."""
+        hits = list(hits)
+        for hit, (book, chapter, verse) in zip(hits, self.cite_many(h['start_index'] for h in hits)):
+            hit['book'] = book
+            hit['chapter'] = chapter
+            hit['verse'] = verse
+        return hits
+
+    def format(self, citation):
+        book, chapter, verse = citation
+        return f"{book} {chapter}:{verse}"
+
+    def word_at(self, offset):
+        """Returns the index of the word containing offset."""
+        return bisect_right(self.word_starts, offset) - 1
+
+    def word_span(self, word):
+        """Returns (start, end) offsets of a word."""
+        end = self.word_starts[word + 1] if word + 1 < len(self.word_starts) else self.length
+        return self.word_starts[word], end
+
+    def bounds(self, book, first_chapter=None, last_chapter=None):
+        """
+        Returns the (start, end) offsets of a book or a chapter range within it,
+        for restricting a search by slicing the flat text.
+        """
+        book_id = self.book_id(book)
+        if self._chapter_keys is None:
+            self._chapter_keys = array.array('L', ((b << 16) | c for b, c in zip(self.verse_books, self.verse_chapters)))
+        first = first_chapter if first_chapter is not None else 0
+        last = last_chapter if last_chapter is not None else 0xFFFF
+        lo_row = bisect_left(self._chapter_keys, (book_id << 16) | first)
+        hi_row = bisect_right(self._chapter_keys, (book_id << 16) | last)
+        if lo_row >= hi_row:
+            raise KeyError(f"No verses for {book} chapters {first_chapter}-{last_chapter}")
+        lo = self.verse_starts[lo_row]
+        hi = self.verse_starts[hi_row] if hi_row < len(self.verse_starts) else self.length
+        return lo, hi
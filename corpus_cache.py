@@ -0,0 +1,160 @@
+import array
+import hashlib
+import json
+import mmap
+import os
+
+class CorpusCache:
+    """
+    On-disk cache of the normalized corpus as letter codes (one byte per letter).
+
+    The codes file is memory-mapped on load, so the full Tanakh is available in
+    milliseconds without touching the JSON sources. A small meta file records the
+    SHA-256 of every source book; if any of them changes the cache is rebuilt.
+    Side tables built with the codes (verse offsets, word starts, ...) are kept
+    as named array files next to it.
+    """
+    FORMAT_VERSION = 2
+
+    def __init__(self, cache_dir=os.path.join("data", "cache"), name="tanakh"):
+        self.cache_dir = cache_dir
+        self.codes_path = os.path.join(cache_dir, name + ".codes")
+        self.meta_path = os.path.join(cache_dir, name + ".meta.json")
+        self.name = name
+
+    def array_path(self, key):
+        return os.path.join(self.cache_dir, f"{self.name}.{key}.arr")
+
+    def digest_sources(self, paths):
+        """Returns {path: sha256 hex digest} for the source files (None if missing)."""
+        digests = {}
+        for path in paths:
+            if not os.path.exists(path):
+                digests[path] = None
+                continue
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            digests[path] = h.hexdigest()
+        return digests
+
+    def read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_valid(self, sources):
+        """True if the cache exists and was built from exactly these source files."""
+        meta = self.read_meta()
+        if not meta or meta.get('version') != self.FORMAT_VERSION:
+            return False
+        if not os.path.exists(self.codes_path):
+            return False
+        if os.path.getsize(self.codes_path) != meta.get('length'):
+            return False
+        return meta.get('sources') == self.digest_sources(sources)
+
+    def load(self, sources):
+        """
+        Memory-maps the cached letter codes.
+
+        Returns:
+            memoryview over the codes, or None if the cache is missing or stale.
+        """
+        if not self.is_valid(sources):
+            return None
+        if os.path.getsize(self.codes_path) == 0:
+            return memoryview(b'')
+        with open(self.codes_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mm)
+
+    def load_array(self, key):
+        """Reads a side table saved with the codes, or None if it is not cached."""
+        meta = self.read_meta()
+        if not meta or key not in meta.get('arrays', {}):
+            return None
+        arr = array.array(meta['arrays'][key])
+        with open(self.array_path(key), 'rb') as f:
+            arr.frombytes(f.read())
+        return arr
+
+    def save_arrays(self, arrays):
+        """
+        Adds side tables to an existing cache. They are dropped again whenever
+        the codes are rebuilt by save().
+
+        Returns:
+            bool: False if there is no cache to add to.
+        """
+        meta = self.read_meta()
+        if not meta:
+            return False
+        for key, arr in arrays.items():
+            with open(self.array_path(key) + ".tmp", 'wb') as f:
+                arr.tofile(f)
+            os.replace(self.array_path(key) + ".tmp", self.array_path(key))
+        meta.setdefault('arrays', {}).update({key: arr.typecode for key, arr in arrays.items()})
+        self._write_meta(meta)
+        return True
+
+    def array_keys(self, prefix=""):
+        """Keys of the cached side tables that start with prefix."""
+        meta = self.read_meta()
+        return [key for key in (meta or {}).get('arrays', {}) if key.startswith(prefix)]
+
+    def drop_arrays(self, keys):
+        """Removes side tables from the cache, meta entry first, then the file."""
+        meta = self.read_meta()
+        keys = [key for key in keys if meta and key in meta.get('arrays', {})]
+        if not keys:
+            return
+        for key in keys:
+            del meta['arrays'][key]
+        self._write_meta(meta)
+        for key in keys:
+            if os.path.exists(self.array_path(key)):
+                os.remove(self.array_path(key))
+
+    def _write_meta(self, meta):
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp_meta, self.meta_path)
+
+    def save(self, codes, sources, arrays=None):
+        """
+        Writes the letter codes and the source digests they were built from.
+
+        Args:
+            codes (bytes): The letter codes.
+            sources (list): Source file paths the codes were built from.
+            arrays (dict): Optional {key: array.array} side tables.
+        """
+        arrays = arrays or {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to temp files first so a crash never leaves a half-written cache
+        tmp_codes = self.codes_path + ".tmp"
+        with open(tmp_codes, 'wb') as f:
+            f.write(codes)
+        for key, arr in arrays.items():
+            with open(self.array_path(key) + ".tmp", 'wb') as f:
+                arr.tofile(f)
+        meta = {
+            'version': self.FORMAT_VERSION,
+            'length': len(codes),
+            'sources': self.digest_sources(sources),
+            'arrays': {key: arr.typecode for key, arr in arrays.items()},
+        }
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp_codes, self.codes_path)
+        for key in arrays:
+            os.replace(self.array_path(key) + ".tmp", self.array_path(key))
+        os.replace(tmp_meta, self.meta_path)
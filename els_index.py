@@ -0,0 +1,303 @@
+from bisect import bisect_left
+
+class LetterIndex:
+    """
+    Letter-position index over a flat stream of one-byte symbols.
+
+    The positions of every letter are held as a bitset packed into a Python int
+    (bit n is set when the stream has that letter at offset n). Testing all
+    start positions for one skip is then a handful of shifts and ANDs on those
+    ints, which run in C over the whole stream at once instead of building a
+    slice per start position.
+    """
+    def __init__(self, symbols):
+        self.symbols = bytes(symbols)
+        self.length = len(self.symbols)
+        self._bits = {}
+        self._residue_bits = {}
+
+    def bits(self, symbol):
+        """Returns the position bitset of a symbol (an int in 0..255)."""
+        if symbol not in self._bits:
+            table = bytearray(b'0' * 256)
+            table[symbol] = ord('1')
+            # int() wants the most significant bit first, i.e. the last offset
+            flags = self.symbols.translate(table)[::-1]
+            self._bits[symbol] = int(flags, 2) if flags else 0
+        return self._bits[symbol]
+
+    def class_bits(self, symbols):
+        """Bitset of the positions holding any of symbols (bytes)."""
+        if len(symbols) == 1:
+            return self.bits(symbols[0])
+        key = bytes(sorted(symbols))
+        if key not in self._bits:
+            mask = 0
+            for symbol in key:
+                mask |= self.bits(symbol)
+            self._bits[key] = mask
+        return self._bits[key]
+
+    def shifted(self, symbol, offset):
+        """Bitset with bit n set when the stream has symbol at n + offset."""
+        bits = self.bits(symbol)
+        return bits >> offset if offset >= 0 else bits << -offset
+
+    def match_mask(self, term, skip):
+        """
+        Bitset of every start n such that term[k] sits at n + k * skip for all k.
+        Positions falling outside the stream simply have no bits, so the bounds
+        check of the slice version comes for free.
+        """
+        mask = self.bits(term[0])
+        for k in range(1, len(term)):
+            if not mask:
+                break
+            mask &= self.shifted(term[k], k * skip)
+        return mask
+
+    def approximate_masks(self, term, skip, max_mismatches):
+        """
+        Bitsets of the starts where term (bytes) matches at skip with up to
+        max_mismatches substituted letters.
+
+        Mismatches are tallied per start with bit-sliced saturating counters:
+        at_least[i] holds the starts with more than i mismatches so far, and
+        each letter's mismatch bitset is added with one AND/OR per counter.
+        Starts whose letters would run off the stream are masked out up front.
+
+        Returns:
+            list: mask i holds the starts with exactly i mismatches.
+        """
+        span = (len(term) - 1) * abs(skip)
+        if span >= self.length:
+            return [0] * (max_mismatches + 1)
+        if skip >= 0:
+            bounds = (1 << (self.length - span)) - 1
+        else:
+            bounds = ((1 << (self.length - span)) - 1) << span
+        at_least = [0] * (max_mismatches + 1)
+        for k in range(len(term)):
+            missed = bounds ^ (bounds & self.shifted(term[k], k * skip))
+            for i in range(max_mismatches, 0, -1):
+                at_least[i] |= at_least[i - 1] & missed
+            at_least[0] |= missed
+            if not bounds & ~at_least[max_mismatches]:
+                break
+        exact = [bounds & ~at_least[0]]
+        for i in range(1, max_mismatches + 1):
+            exact.append(at_least[i - 1] & ~at_least[i])
+        return exact
+
+    def count(self, term, skip):
+        """Number of starts of term (bytes) at the given skip."""
+        return popcount(self.match_mask(term, skip))
+
+    def starts(self, term, skip):
+        """Ascending start offsets of term (bytes) at the given skip."""
+        return set_bits(self.match_mask(term, skip))
+
+    def positions(self, symbol):
+        """Ascending offsets of a symbol."""
+        return set_bits(self.bits(symbol))
+
+    def residue_bits(self, symbol, stride, residue, reverse=False):
+        """
+        Bitset of symbol over the residue class symbols[residue::stride].
+        With reverse=True bit x stands for the x-th element from the end.
+        """
+        key = (symbol, stride, residue, reverse)
+        if key not in self._residue_bits:
+            table = bytearray(b'0' * 256)
+            table[symbol] = ord('1')
+            flags = self.symbols[residue::stride].translate(table)
+            if not reverse:
+                flags = flags[::-1]
+            self._residue_bits[key] = int(flags, 2) if flags else 0
+        return self._residue_bits[key]
+
+    def full_range_matches(self, term, max_skip=None, anchor_range=None):
+        """
+        Finds term (bytes, 2+ letters) at every skip up to max_skip, or at every
+        skip that fits in the stream when max_skip is None.
+
+        Rather than looping over skips, each occurrence p of the term's rarest
+        letter is paired with the positions of the other letters: for the
+        letter at term index k the candidates p + (k - i) * d, taken over all
+        d, form one residue class mod |k - i|, so a single shift of that class's
+        bitset lines up every implied skip at once. ANDing the letters from
+        rarest to commonest (the second rarest first, which is the letter-pair
+        filter) leaves exactly the skips where the whole term matches.
+
+        anchor_range = (lo, hi) limits the work to anchors at offsets lo..hi-1,
+        which is how search_full_range splits it across processes.
+
+        Returns:
+            list: (start, skip) tuples ordered by skip, then start.
+        """
+        if len(term) < 2:
+            raise ValueError("Full-range search needs a term of at least two letters")
+        counts = {symbol: self.symbols.count(symbol) for symbol in set(term)}
+        order = sorted(range(len(term)), key=lambda k: counts[term[k]])
+        anchor, others = order[0], order[1:]
+        limit = ((1 << (max_skip + 1)) - 1) if max_skip is not None else -1
+        residue_lengths = {}
+
+        anchors = self.positions(term[anchor])
+        if anchor_range is not None:
+            anchors = anchors[bisect_left(anchors, anchor_range[0]):bisect_left(anchors, anchor_range[1])]
+
+        hits = []
+        for p in anchors:
+            for sign in (1, -1):
+                mask = limit & ~1  # bit e stands for skip sign * e, e >= 1
+                for k in others:
+                    gap = abs(k - anchor)
+                    residue, at = p % gap, p // gap
+                    if (k - anchor) * sign > 0:
+                        # Later letter sits at p + gap * e: forward in the residue class
+                        mask &= self.residue_bits(term[k], gap, residue) >> at
+                    else:
+                        # Earlier letter sits at p - gap * e: walk the class backwards
+                        if (gap, residue) not in residue_lengths:
+                            residue_lengths[(gap, residue)] = len(range(residue, self.length, gap))
+                        back = residue_lengths[(gap, residue)] - 1 - at
+                        mask &= self.residue_bits(term[k], gap, residue, reverse=True) >> back
+                    if not mask:
+                        break
+                for e in set_bits(mask):
+                    d = sign * e
+                    hits.append((d, p - anchor * d))
+        hits.sort()
+        return [(start, d) for d, start in hits]
+
+    def match_many(self, trie, skip):
+        """
+        Matches every term of a TermTrie at one skip.
+
+        Walks the trie depth first carrying the bitset of starts that spell the
+        node's prefix, so a prefix shared by many terms is ANDed only once and
+        dead branches are cut as soon as their bitset is empty. The bitsets of
+        all terminal nodes are ORed together and unpacked once; each surviving
+        start is then labelled by following the trie letter by letter.
+
+        Returns:
+            dict: {term id: ascending start offsets}
+        """
+        hits = 0
+        shifted = {}  # (symbol, offset) -> bitset, shared by all nodes at this skip
+        stack = [(child, self.bits(symbol), 1) for symbol, child in trie.root.children.items()]
+        while stack:
+            node, mask, depth = stack.pop()
+            if node.terms:
+                hits |= mask
+            for symbol, child in node.children.items():
+                key = (symbol, depth * skip)
+                if key not in shifted:
+                    shifted[key] = self.shifted(symbol, depth * skip)
+                child_mask = mask & shifted[key]
+                if child_mask:
+                    stack.append((child, child_mask, depth + 1))
+
+        found = {}
+        symbols, length = self.symbols, self.length
+        for n in set_bits(hits):
+            node = trie.root
+            pos = n
+            while 0 <= pos < length:
+                node = node.children.get(symbols[pos])
+                if node is None:
+                    break
+                for term_id in node.terms:
+                    found.setdefault(term_id, []).append(n)
+                pos += skip
+        return found
+
+    def match_dfa(self, dfa, skip):
+        """
+        Runs an ELSPattern DFA at one skip, for all starts at once.
+
+        The walk goes one letter depth at a time, carrying for each DFA state
+        the bitset of starts whose first letters lead to it. Reaching the same
+        state by different letters ORs the bitsets, so the work per depth is
+        bounded by the number of DFA transitions, not by the number of words
+        the pattern expands to.
+
+        Returns:
+            dict: {(pattern id, length): ascending start offsets}
+        """
+        found = {}
+        level = {dfa.start: (1 << self.length) - 1}
+        depth = 0
+        while level:
+            following = {}
+            for state, mask in level.items():
+                if depth:
+                    for label in dfa.accepts[state]:
+                        found[(label, depth)] = found.get((label, depth), 0) | mask
+                for c, target in dfa.transitions[state].items():
+                    offset = depth * skip
+                    bits = self.class_bits(dfa.classes[c])
+                    child = mask & (bits >> offset if offset >= 0 else bits << -offset)
+                    if child:
+                        following[target] = following.get(target, 0) | child
+            level = following
+            depth += 1
+        return {key: set_bits(mask) for key, mask in found.items()}
+
+
+class TrieNode:
+    def __init__(self):
+        self.children = {}
+        self.terms = []
+
+
+class TermTrie:
+    """Prefix tree of search terms (as bytes); terms are identified by their input position."""
+    def __init__(self, terms):
+        self.root = TrieNode()
+        self.terms = list(terms)
+        for term_id, term in enumerate(self.terms):
+            if not term:
+                continue
+            node = self.root
+            for symbol in term:
+                node = node.children.setdefault(symbol, TrieNode())
+            node.terms.append(term_id)
+
+
+def popcount(mask):
+    """Number of set bits (int.bit_count on Python 3.10+)."""
+    try:
+        return mask.bit_count()
+    except AttributeError:
+        return bin(mask).count('1')
+
+
+def set_bits(mask):
+    """
+    Returns the indices of the set bits of mask in ascending order.
+
+    The int is split in halves until the pieces are small enough to format as
+    a binary string, so sparse masks over the whole corpus cost a few C-level
+    passes instead of one big string per call.
+    """
+    found = []
+    stack = [(mask, 0)]
+    while stack:
+        part, base = stack.pop()
+        width = part.bit_length()
+        if width <= 2048:
+            flags = format(part, 'b')[::-1]
+            i = flags.find('1')
+            while i >= 0:
+                found.append(base + i)
+                i = flags.find('1', i + 1)
+            continue
+        half = width >> 1
+        low = part & ((1 << half) - 1)
+        # Low half is pushed last so it is popped first: results stay ascending
+        stack.append((part >> half, base + half))
+        if low:
+            stack.append((low, base))
+    return found
@@ -0,0 +1,152 @@
+from text_processor import ALPHABET, SOFIT_FORMS
+
+# Every letter the patterns can match, as ISO-8859-8 bytes (sofit forms included)
+LETTERS = (ALPHABET + "".join(SOFIT_FORMS)).encode('iso8859_8')
+REGULAR = {v: k for k, v in SOFIT_FORMS.items()}  # regular -> sofit
+
+
+class ELSPattern:
+    """
+    ELS query patterns compiled into one DFA.
+
+    Pattern syntax:
+        א       a letter
+        ?       any letter
+        [הח]    any of the letters in brackets; [^הח] any letter but these
+        (ו)     optional: the letters in parentheses may be left out, e.g.
+                ד(ו)ד matches both דוד and דד
+
+    With fold_sofit=True a letter also matches its final/regular twin, so
+    שלום and שלומ are the same query.
+
+    Several patterns can be compiled together; each accepting state carries
+    the ids (input positions) of the patterns it completes, so one walk of
+    the DFA reports which pattern matched. Letters that no pattern tells
+    apart share one letter class, and transitions are taken per class.
+    """
+    def __init__(self, patterns, fold_sofit=True):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        self.patterns = list(patterns)
+        self.fold_sofit = fold_sofit
+        self.programs = [self.parse(p) for p in self.patterns]
+        self._build_classes()
+        self._build_dfa()
+
+    def _letter_set(self, chars, pattern):
+        symbols = set()
+        for char in chars:
+            if char not in ALPHABET and char not in SOFIT_FORMS:
+                raise ValueError(f"Not a Hebrew letter in pattern {pattern!r}: {char!r}")
+            group = {char}
+            if self.fold_sofit:
+                group |= {SOFIT_FORMS.get(char, char), REGULAR.get(char, char)}
+            symbols |= {c.encode('iso8859_8')[0] for c in group}
+        return frozenset(symbols)
+
+    def parse(self, pattern):
+        """
+        Parses a pattern into (steps, optional) where steps is a list of letter
+        sets and optional maps the step that opens an optional group to the step
+        just after it.
+        """
+        steps = []
+        optional = {}
+        group_start = None
+        i = 0
+        text = "".join(pattern.split())
+        while i < len(text):
+            char = text[i]
+            if char == '?':
+                steps.append(frozenset(LETTERS))
+            elif char == '[':
+                end = text.find(']', i)
+                if end < 0:
+                    raise ValueError(f"Unclosed [ in pattern {pattern!r}")
+                body = text[i + 1:end]
+                negate = body.startswith('^')
+                letters = self._letter_set(body[1:] if negate else body, pattern)
+                if not letters:
+                    raise ValueError(f"Empty letter class in pattern {pattern!r}")
+                steps.append(frozenset(LETTERS) - letters if negate else letters)
+                i = end
+            elif char == '(':
+                if group_start is not None:
+                    raise ValueError(f"Nested ( in pattern {pattern!r}")
+                group_start = len(steps)
+            elif char == ')':
+                if group_start is None:
+                    raise ValueError(f"Unmatched ) in pattern {pattern!r}")
+                if len(steps) > group_start:
+                    optional.setdefault(group_start, []).append(len(steps))
+                group_start = None
+            else:
+                steps.append(self._letter_set(char, pattern))
+            i += 1
+        if group_start is not None:
+            raise ValueError(f"Unclosed ( in pattern {pattern!r}")
+        if (0, len(steps)) in self._closure({(0, 0)}, [(steps, optional)]):
+            raise ValueError(f"Pattern {pattern!r} must require at least one letter")
+        return steps, optional
+
+    def _closure(self, states, programs=None):
+        """Adds the states reachable by skipping optional groups."""
+        programs = programs or self.programs
+        stack = list(states)
+        closed = set(states)
+        while stack:
+            pid, pos = stack.pop()
+            for end in programs[pid][1].get(pos, ()):
+                if (pid, end) not in closed:
+                    closed.add((pid, end))
+                    stack.append((pid, end))
+        return frozenset(closed)
+
+    def _build_classes(self):
+        """Groups letters by the set of pattern steps that accept them."""
+        sets = sorted({s for steps, _ in self.programs for s in steps}, key=sorted)
+        groups = {}
+        for symbol in LETTERS:
+            signature = tuple(symbol in s for s in sets)
+            if any(signature):
+                groups.setdefault(signature, []).append(symbol)
+        self.classes = [bytes(symbols) for symbols in groups.values()]
+        self.class_of = {symbol: c for c, symbols in enumerate(self.classes) for symbol in symbols}
+
+    def _build_dfa(self):
+        """Subset construction over the letter classes."""
+        start = self._closure({(pid, 0) for pid in range(len(self.programs))})
+        ids = {start: 0}
+        self.transitions = []
+        self.accepts = []
+        queue = [start]
+        while len(self.transitions) < len(queue):
+            current = queue[len(self.transitions)]
+            moves = {}
+            for c, symbols in enumerate(self.classes):
+                symbol = symbols[0]
+                target = set()
+                for pid, pos in current:
+                    steps = self.programs[pid][0]
+                    if pos < len(steps) and symbol in steps[pos]:
+                        target.add((pid, pos + 1))
+                if target:
+                    target = self._closure(target)
+                    if target not in ids:
+                        ids[target] = len(queue)
+                        queue.append(target)
+                    moves[c] = ids[target]
+            self.transitions.append(moves)
+            self.accepts.append(sorted(pid for pid, pos in current if pos == len(self.programs[pid][0])))
+        self.start = 0
+
+    def match(self, word):
+        """Pattern ids that accept the whole word (str), for checking patterns."""
+        state = self.start
+        for symbol in word.encode('iso8859_8', 'replace'):
+            if symbol not in self.class_of:
+                return []
+            state = self.transitions[state].get(self.class_of[symbol])
+            if state is None:
+                return []
+        return self.accepts[state]
@@ -1,6 +1,40 @@
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+from els_index import LetterIndex, TermTrie, set_bits
+from els_pattern import ELSPattern
+from ciphers import CipherEngine, CLASSIC_CIPHERS
+from text_processor import ALPHABET, SOFIT_FORMS
+
+# Per-process state of search_parallel workers
+_worker_index = None
+
 class BibleCodeScanner:
-    def __init__(self):
-        pass
+    def __init__(self, result_cache=None, cipher_engine=None):
+        # LetterIndex of the last text searched, reused while the text is the same
+        self._indexed_text = None
+        self._index = None
+        # Optional ELSResultCache consulted by search and search_many
+        self.result_cache = result_cache
+        # CipherEngine used by search_ciphers (created on first use)
+        self.cipher_engine = cipher_engine
+
+    def get_index(self, text):
+        """
+        Returns the LetterIndex for text, or None if the text has characters
+        outside ISO-8859-8 (the index needs one byte per character).
+        """
+        if self._indexed_text is not None and (text is self._indexed_text or text == self._indexed_text):
+            return self._index
+        try:
+            symbols = text.encode('iso8859_8')
+        except UnicodeEncodeError:
+            return None
+        self._indexed_text = text
+        self._index = LetterIndex(symbols)
+        return self._index
 
     def search(self, text, term, min_skip=1, max_skip=100):
         """
@@ -13,8 +47,347 @@ class BibleCodeScanner:
             max_skip (int): Maximum skip distance.
             
         Yields:
-            dict: { 'term': term, 'start_index': n, 'skip': d, 'sequence': found_sequence }
+            dict: { 'term': term, 'start_index': n, 'skip': d }
+            Hits come ordered by skip, then by start index.
+        """
+        if len(term) == 0 or len(text) == 0:
+            return
+
+        index = self.get_index(text)
+        if index is None:
+            yield from self._search_slices(text, term, min_skip, max_skip)
+            return
+        try:
+            symbols = term.encode('iso8859_8')
+        except UnicodeEncodeError:
+            return  # the term has a character the text cannot contain
+        if self.result_cache is not None:
+            yield from self._search_cached(text, index, [term], min_skip, max_skip)
+            return
+
+        for d in range(min_skip, max_skip + 1):
+            if d == 0: continue
+            for n in index.starts(symbols, d):
+                yield {
+                    'term': term,
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def search_many(self, text, terms, min_skip=1, max_skip=100):
+        """
+        Searches for many terms at once.
+
+        The terms are grouped in a trie and each skip is walked only once for
+        all of them, so a lexicon of thousands of words shares the work of
+        every common prefix instead of rescanning the text per term.
+
+        Yields:
+            dict: { 'term': term, 'start_index': n, 'skip': d }
+            Hits come ordered by skip, then start index, then term order.
+        """
+        terms = list(dict.fromkeys(t for t in terms if t))
+        if not terms or len(text) == 0:
+            return
+
+        index = self.get_index(text)
+        if index is None:
+            for d in range(min_skip, max_skip + 1):
+                hits = [h for term in terms for h in self._search_slices(text, term, d, d)]
+                hits.sort(key=lambda h: h['start_index'])
+                yield from hits
+            return
+        if self.result_cache is not None:
+            yield from self._search_cached(text, index, terms, min_skip, max_skip)
+            return
+        yield from self._match_many(index, terms, min_skip, max_skip)
+
+    def _match_many(self, index, terms, min_skip, max_skip):
+        trie = TermTrie(self._encode_terms(terms))
+        for d in range(min_skip, max_skip + 1):
+            if d == 0: continue
+            found = index.match_many(trie, d)
+            order = sorted((n, term_id) for term_id, starts in found.items() for n in starts)
+            for n, term_id in order:
+                yield {
+                    'term': terms[term_id],
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def _search_cached(self, text, index, terms, min_skip, max_skip):
+        """
+        search_many through the result cache. The skip range is split into its
+        backward and forward parts; each (term, part) is answered from a cached
+        range covering it when there is one, and the rest is scanned in one
+        trie pass and stored. All the cache reads and writes of one call are
+        committed together before the first hit is yielded.
+        """
+        cache = self.result_cache
+        corpus = cache.corpus_digest(text)
+        parts = []
+        if min_skip < 0:
+            parts.append((min_skip, min(max_skip, -1)))
+        if max_skip > 0:
+            parts.append((max(min_skip, 1), max_skip))
+
+        results = []
+        for first, last in parts:
+            direction = 1 if first > 0 else -1
+            lo, hi = (first, last) if direction > 0 else (-last, -first)
+            found = []
+            missing = []
+            for term_id, term in enumerate(terms):
+                cached = cache.lookup(corpus, term, direction, lo, hi)
+                if cached is None:
+                    missing.append(term_id)
+                else:
+                    found.extend((d, n, term_id) for n, d in zip(*cached))
+            if missing:
+                scanned = {term_id: ([], []) for term_id in missing}
+                ids = {terms[term_id]: term_id for term_id in missing}
+                for hit in self._match_many(index, [terms[t] for t in missing], first, last):
+                    starts, skips = scanned[ids[hit['term']]]
+                    starts.append(hit['start_index'])
+                    skips.append(hit['skip'])
+                for term_id, (starts, skips) in scanned.items():
+                    cache.store(corpus, terms[term_id], direction, lo, hi, starts, skips)
+                    found.extend((d, n, term_id) for n, d in zip(starts, skips))
+            found.sort()
+            results.append(found)
+        cache.flush()
+
+        for found in results:
+            for d, n, term_id in found:
+                yield {
+                    'term': terms[term_id],
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def search_approximate(self, text, term, max_mismatches=1, min_skip=1, max_skip=100):
+        """
+        Searches for a term allowing up to max_mismatches substituted letters,
+        e.g. to catch spelling variants that exact search misses.
+
+        The mismatch counts of all starts at one skip are kept as bit-sliced
+        counters over the letter bitsets (see LetterIndex.approximate_masks),
+        so each allowed mismatch adds one AND/OR per letter to the exact search.
+
+        Yields:
+            dict: { 'term': term, 'found': letters found, 'mismatches': m,
+                    'start_index': n, 'skip': d }
+            Hits come ordered by skip, then start index.
+        """
+        if len(term) == 0 or len(text) == 0:
+            return
+        if max_mismatches >= len(term):
+            raise ValueError("max_mismatches must be smaller than the term length")
+        index = self.get_index(text)
+        if index is None:
+            raise ValueError("Approximate search needs a text of Hebrew letters")
+        symbols = term.encode('iso8859_8', 'replace')
+
+        for d in range(min_skip, max_skip + 1):
+            if d == 0: continue
+            masks = index.approximate_masks(symbols, d, max_mismatches)
+            order = sorted((n, m) for m, mask in enumerate(masks) for n in set_bits(mask))
+            for n, m in order:
+                yield {
+                    'term': term,
+                    'found': bytes(index.symbols[n + k * d] for k in range(len(term))).decode('iso8859_8'),
+                    'mismatches': m,
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def search_pattern(self, text, patterns, min_skip=1, max_skip=100, fold_sofit=True):
+        """
+        Searches for ELS patterns with wildcards, letter classes and optional
+        letters (see ELSPattern for the syntax).
+
+        All patterns are compiled into one DFA that is walked once per skip
+        over the letter bitsets, so a pattern costs about as much as a single
+        exact term however many spellings it covers.
+
+        Args:
+            patterns (str, list or ELSPattern): Pattern(s) to search for.
+            fold_sofit (bool): Let letters match their final/regular twin.
+
+        Yields:
+            dict: { 'term': letters found, 'pattern': pattern, 'start_index': n, 'skip': d }
+            Hits come ordered by skip, start index, length, then pattern order.
         """
+        dfa = patterns if isinstance(patterns, ELSPattern) else ELSPattern(patterns, fold_sofit)
+        if len(text) == 0:
+            return
+        index = self.get_index(text)
+        if index is None:
+            raise ValueError("Pattern search needs a text of Hebrew letters")
+        symbols = index.symbols
+
+        for d in range(min_skip, max_skip + 1):
+            if d == 0: continue
+            found = index.match_dfa(dfa, d)
+            order = sorted((n, length, label) for (label, length), starts in found.items() for n in starts)
+            for n, length, label in order:
+                yield {
+                    'term': bytes(symbols[n + k * d] for k in range(length)).decode('iso8859_8'),
+                    'pattern': dfa.patterns[label],
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def search_ciphers(self, text, terms, ciphers=CLASSIC_CIPHERS, min_skip=1, max_skip=100):
+        """
+        Searches for terms as ELS of the enciphered text, for several ciphers
+        in one pass over the original text.
+
+        A term shows up in the text enciphered with cipher C exactly where
+        C's inverse image of the term shows up in the original, so the images
+        under all ciphers are compiled into one ELSPattern DFA and searched
+        together with search_pattern; nothing is re-enciphered or rescanned.
+        Sofit forms count as their regular letter (the ciphers fold them).
+
+        Args:
+            terms (str or list): Term(s) as read in the enciphered text,
+                Hebrew letters only (ValueError otherwise; the images are
+                compiled as ELSPattern patterns, where ? or [ mean more).
+            ciphers (list): Cipher names of self.cipher_engine, e.g.
+                list(engine.ciphers) for every registered cipher.
+
+        Yields:
+            dict: { 'term': term, 'cipher': name, 'found': letters in the
+                    original text, 'start_index': n, 'skip': d }
+            Hits come ordered by skip, then start index.
+        """
+        if self.cipher_engine is None:
+            self.cipher_engine = CipherEngine()
+        if isinstance(terms, str):
+            terms = [terms]
+        # Different ciphers can share an image (shift0 is the plain text), so
+        # each distinct image is searched once and reported for all of them
+        images = {}
+        for term in terms:
+            if not term:
+                continue
+            if any(char not in ALPHABET and char not in SOFIT_FORMS for char in term):
+                raise ValueError(f"Cipher search needs terms of Hebrew letters: {term!r}")
+            for cipher in ciphers:
+                image = self.cipher_engine.decipher(term, cipher)
+                images.setdefault(image, []).append((term, cipher))
+        if not images:
+            return
+        dfa = ELSPattern(list(images))
+        for hit in self.search_pattern(text, dfa, min_skip, max_skip):
+            for term, cipher in images[hit['pattern']]:
+                yield {
+                    'term': term,
+                    'cipher': cipher,
+                    'found': hit['term'],
+                    'start_index': hit['start_index'],
+                    'skip': hit['skip']
+                }
+
+    def search_full_range(self, text, term, max_skip=None, workers=1):
+        """
+        Searches for a term at every skip, forward and backward, without a
+        caller-chosen range: up to len(text) / (len(term) - 1) by default, or
+        up to max_skip when given.
+
+        The work is driven by the occurrences of the term's rarest letter (see
+        LetterIndex.full_range_matches) and can be split across a process pool
+        with workers > 1. When max_skip is small enough that looping over the
+        skips is cheaper, the regular search is used instead.
+
+        Yields:
+            dict: { 'term': term, 'start_index': n, 'skip': d }
+            Hits come ordered by skip (most negative first), then start index,
+            i.e. the same as search(text, term, -max, max).
+        """
+        if len(term) < 2:
+            raise ValueError("Full-range search needs a term of at least two letters")
+        if len(text) == 0:
+            return
+        index = self.get_index(text)
+        if index is None:
+            limit = max_skip if max_skip is not None else len(text)
+            yield from self._search_slices(text, term, -limit, limit)
+            return
+        try:
+            symbols = term.encode('iso8859_8')
+        except UnicodeEncodeError:
+            return
+        anchors = min(index.symbols.count(symbol) for symbol in symbols)
+        if max_skip is not None and max_skip <= anchors:
+            yield from self.search(text, term, -max_skip, max_skip)
+            return
+
+        if workers > 1:
+            bounds = [index.length * i // (workers * 4) for i in range(workers * 4 + 1)]
+            with shared_corpus_pool(index.symbols, workers) as pool:
+                parts = pool.map(_match_full_range, repeat(symbols), repeat(max_skip), bounds[:-1], bounds[1:])
+                matches = sorted((d, n) for part in parts for n, d in part)
+            matches = [(n, d) for d, n in matches]
+        else:
+            matches = index.full_range_matches(symbols, max_skip)
+
+        for n, d in matches:
+            yield {
+                'term': term,
+                'start_index': n,
+                'skip': d
+            }
+
+    def search_parallel(self, text, terms, min_skip=1, max_skip=100, workers=None):
+        """
+        Parallel version of search_many: the skip range is split across a
+        process pool.
+
+        The encoded text is copied once into multiprocessing.shared_memory and
+        every worker attaches to it by name, so the corpus is never pickled
+        per worker or per task. Results are merged in skip order, making the
+        output identical to search_many.
+        """
+        workers = workers or os.cpu_count() or 1
+        terms = list(dict.fromkeys(t for t in terms if t))
+        if not terms or len(text) == 0:
+            return
+        try:
+            symbols = text.encode('iso8859_8')
+        except UnicodeEncodeError:
+            symbols = None
+        if workers <= 1 or symbols is None:
+            yield from self.search_many(text, terms, min_skip, max_skip)
+            return
+
+        skips = [d for d in range(min_skip, max_skip + 1) if d != 0]
+        # A few chunks per worker keeps the pool busy when some skips are slower
+        chunk_size = max(1, -(-len(skips) // (workers * 4)))
+        chunks = [skips[i:i + chunk_size] for i in range(0, len(skips), chunk_size)]
+        encoded = self._encode_terms(terms)
+
+        with shared_corpus_pool(symbols, workers) as pool:
+            for chunk_hits in pool.map(_match_skips, repeat(encoded), chunks):
+                for d, order in chunk_hits:
+                    for n, term_id in order:
+                        yield {
+                            'term': terms[term_id],
+                            'start_index': n,
+                            'skip': d
+                        }
+
+    def _encode_terms(self, terms):
+        encoded = []
+        for term in terms:
+            try:
+                encoded.append(term.encode('iso8859_8'))
+            except UnicodeEncodeError:
+                encoded.append(b'')  # cannot occur in the text
+        return encoded
+
+    def _search_slices(self, text, term, min_skip, max_skip):
+        """Original slice-per-start search, kept for texts the index cannot encode."""
         text_len = len(text)
         term_len = len(term)
         
@@ -66,3 +439,56 @@ class BibleCodeScanner:
                             }
                 except Exception:
                     continue
+
+    def search_span(self, text, term, span, min_skip=1, max_skip=100):
+        """
+        Same as search, restricted to text[start:end] for span = (start, end),
+        e.g. a book or chapter range from CitationIndex.bounds.
+        start_index in the yielded hits is still an offset into the full text.
+        """
+        start, end = span
+        for hit in self.search(text[start:end], term, min_skip, max_skip):
+            hit['start_index'] += start
+            yield hit
+
+
+@contextmanager
+def shared_corpus_pool(symbols, workers):
+    """
+    Process pool whose workers each hold a LetterIndex over symbols.
+    The bytes are placed in shared memory once and attached by name.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(symbols)))
+    try:
+        shm.buf[:len(symbols)] = symbols
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_corpus,
+                                 initargs=(shm.name, len(symbols))) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _attach_corpus(name, length):
+    """Pool initializer: builds this worker's LetterIndex from the shared corpus."""
+    global _worker_index
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        _worker_index = LetterIndex(shm.buf[:length])
+    finally:
+        shm.close()
+
+
+def _match_skips(encoded_terms, skips):
+    """Worker task: returns [(skip, sorted [(start, term id)])] for a chunk of skips."""
+    trie = TermTrie(encoded_terms)
+    results = []
+    for d in skips:
+        found = _worker_index.match_many(trie, d)
+        results.append((d, sorted((n, term_id) for term_id, starts in found.items() for n in starts)))
+    return results
+
+
+def _match_full_range(term, max_skip, lo, hi):
+    """Worker task: full-range matches anchored at offsets lo..hi-1."""
+    return _worker_index.full_range_matches(term, max_skip, anchor_range=(lo, hi))
@@ -0,0 +1,139 @@
+import math
+from itertools import combinations, repeat
+from operator import add, floordiv, mod, mul, sub
+
+METRICS = ("area", "distance")
+
+class ELSTable:
+    """
+    Lays ELS hits out as a letter matrix (the flat text written in rows of a
+    given width) and finds the row widths where they sit closest together.
+
+    A layout is scored for all candidate widths at once: every letter offset
+    is turned into a row list and a column list over the widths with map(),
+    and the scores are combined with map() over those lists, so the per-width
+    work runs in C rather than in a Python loop per width.
+
+    With cylinder=True the rows wrap around, i.e. the first and last column
+    are neighbours, which is how ELS tables are usually drawn on paper.
+    """
+    def __init__(self, text, cylinder=False):
+        self.text = text
+        self.cylinder = cylinder
+
+    def letter_offsets(self, hit):
+        """Offsets of the letters of a hit dict ('term', 'start_index', 'skip')."""
+        return [hit['start_index'] + k * hit['skip'] for k in range(len(hit['term']))]
+
+    def _layout(self, offset, widths):
+        return list(map(floordiv, repeat(offset), widths)), list(map(mod, repeat(offset), widths))
+
+    def compactness(self, hits, widths, metric="area"):
+        """
+        Scores the hits for every row width (lower is more compact).
+
+        Args:
+            hits (list): Hit dicts as yielded by BibleCodeScanner.search.
+            widths (list): Candidate row widths.
+            metric (str): "area" - cells in the bounding box of all letters;
+                          "distance" - over every pair of hits, the 2-D distance
+                          between their closest letters, taking the worst pair.
+
+        Returns:
+            list: One score per width, in the order of widths.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric} (choose from {', '.join(METRICS)})")
+        widths = list(widths)
+        if not hits or not widths:
+            return [0] * len(widths)
+        if metric == "area":
+            return self._area(hits, widths)
+        if len(hits) < 2:
+            raise ValueError("The distance metric needs at least two hits")
+        return self._distance(hits, widths)
+
+    def _area(self, hits, widths):
+        offsets = sorted({p for hit in hits for p in self.letter_offsets(hit)})
+        first_rows, _ = self._layout(offsets[0], widths)
+        last_rows, _ = self._layout(offsets[-1], widths)
+        heights = map(sub, last_rows, first_rows)
+        columns = [self._layout(p, widths)[1] for p in offsets]
+        if self.cylinder:
+            spans = map(self._arc, zip(*columns), widths)
+        else:
+            spans = map(sub, map(max, *columns), map(min, *columns)) if len(columns) > 1 else repeat(0)
+        return [(h + 1) * (s + 1) for h, s in zip(heights, spans)]
+
+    def _arc(self, columns, width):
+        """Columns spanned by the shortest arc covering columns on a cylinder, minus one."""
+        cols = sorted(set(columns))
+        gaps = [b - a for a, b in zip(cols, cols[1:])] + [cols[0] + width - cols[-1]]
+        return width - max(gaps)
+
+    def _distance(self, hits, widths):
+        layouts = [[self._layout(p, widths) for p in self.letter_offsets(hit)] for hit in hits]
+        worst = None
+        for letters_a, letters_b in combinations(layouts, 2):
+            squares = []
+            for (rows_a, cols_a), (rows_b, cols_b) in ((a, b) for a in letters_a for b in letters_b):
+                dr = list(map(sub, rows_a, rows_b))
+                dc = list(map(abs, map(sub, cols_a, cols_b)))
+                if self.cylinder:
+                    dc = list(map(min, dc, map(sub, widths, dc)))
+                squares.append(list(map(add, map(mul, dr, dr), map(mul, dc, dc))))
+            closest = list(map(min, *squares)) if len(squares) > 1 else squares[0]
+            worst = closest if worst is None else list(map(max, worst, closest))
+        return list(map(math.sqrt, worst))
+
+    def best_widths(self, hits, min_width=2, max_width=5000, metric="area", top=10):
+        """
+        Returns the top (width, score) pairs, most compact first (ties go to
+        the narrower width).
+        """
+        max_width = min(max_width, max(len(self.text), min_width))
+        widths = range(min_width, max_width + 1)
+        scores = self.compactness(hits, widths, metric)
+        return sorted(zip(widths, scores), key=lambda ws: (ws[1], ws[0]))[:top]
+
+    def render(self, hits, width, margin=2):
+        """
+        Draws the matrix around the hits at a given row width.
+
+        Rows and columns of the bounding box of the hits are shown plus margin
+        on every side; letters belonging to a hit are bracketed.
+
+        Returns:
+            list: Lines of text, each prefixed with the offset of its first cell.
+        """
+        marked = {p for hit in hits for p in self.letter_offsets(hit)}
+        rows = [p // width for p in marked]
+        cols = [p % width for p in marked]
+        first_row = max(0, min(rows) - margin)
+        last_row = min((len(self.text) - 1) // width, max(rows) + margin)
+        first_col = max(0, min(cols) - margin)
+        last_col = min(width - 1, max(cols) + margin)
+
+        lines = []
+        for r in range(first_row, last_row + 1):
+            cells = []
+            for c in range(first_col, last_col + 1):
+                p = r * width + c
+                letter = self.text[p] if p < len(self.text) else " "
+                cells.append(f"[{letter}]" if p in marked else f" {letter} ")
+            lines.append(f"{r * width + first_col:>8} " + "".join(cells))
+        return lines
+
+
+if __name__ == "__main__":
+    from torah_loader import TorahLoader
+    from els_search import BibleCodeScanner
+    text = TorahLoader().load_full_torah()
+    scanner = BibleCodeScanner()
+    torah = next(scanner.search(text, "תורה", 50, 50))
+    table = ELSTable(text)
+    print(f"Hit: start {torah['start_index']}, skip {torah['skip']}")
+    for width, score in table.best_widths([torah], max_width=2000, top=5):
+        print(f"  width {width}: area {score}")
+    width = table.best_widths([torah], max_width=2000, top=1)[0][0]
+    print("\n".join(table.render([torah], width)))
@@ -2,12 +2,26 @@ import math
 import collections
 import random
 import os
-from text_processor import TextProcessor
+import array
+import time
+from itertools import compress, islice
+from operator import add, mul, ne, sub
+from text_processor import TextProcessor, SOFIT_FLAG
+from torah_loader import TorahLoader
+
+# Highest Markov order (context length) markov_entropies handles
+MAX_MARKOV_ORDER = 5
+
+# n-grams are counted in a dense array up to this many codes (22^5, 20 MB);
+# longer n-grams are sorted and counted by runs instead
+DENSE_MAX_CODES = 22 ** 5
 
 class EntropyLab:
     def __init__(self):
         self.tp = TextProcessor()
         self.hebrew_alphabet = "אבגדהוזחטיכלמנסעפצקרשת"
+        # Letter codes with the sofit flag cleared (22 symbols)
+        self.fold_table = bytes(c & ~SOFIT_FLAG if c & ~SOFIT_FLAG < 22 else c for c in range(256))
 
     def calculate_shannon_entropy(self, text):
         """Calculates Shannon Entropy in bits per symbol."""
@@ -21,6 +35,65 @@ class EntropyLab:
             entropy -= p * math.log2(p)
         return entropy
 
+    def ngram_count_values(self, grams, n):
+        """
+        Occurrence counts of the distinct n-gram codes (zero counts left out).
+
+        Codes below DENSE_MAX_CODES are tallied in a dense array('I') indexed by
+        the code; beyond that the codes are sorted and each run of equal codes
+        is one count, so memory stays proportional to the text.
+        """
+        size = 22 ** n
+        if size <= DENSE_MAX_CODES:
+            counts = array.array('I', bytes(4 * size))
+            for code in grams:
+                counts[code] += 1
+            return list(filter(None, counts))
+        ordered = sorted(grams)
+        changes = list(compress(range(1, len(ordered)), map(ne, islice(ordered, 1, None), ordered)))
+        bounds = [0] + changes + [len(ordered)]
+        return list(map(sub, bounds[1:], bounds[:-1]))
+
+    def block_entropy(self, counts):
+        """Entropy in bits of a distribution given by its counts."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        return math.log2(total) - sum(map(mul, counts, map(math.log2, counts))) / total
+
+    def markov_entropies(self, text, max_order=MAX_MARKOV_ORDER):
+        """
+        Conditional entropy H(X | previous k letters) for k = 0..max_order,
+        as the difference of the block entropies of (k+1)-grams and k-grams.
+
+        The n-grams are base-22 codes over the letters (sofit folded), rolled
+        from one order to the next with map()s: code(i, n+1) = 22 * code(i, n)
+        + letter(i + n).
+
+        Args:
+            text (str or bytes): Hebrew text, or letter codes (e.g. load_corpus()).
+
+        Returns:
+            list: (k, conditional entropy, block entropy of (k+1)-grams)
+        """
+        if not 0 <= max_order <= MAX_MARKOV_ORDER:
+            raise ValueError(f"max_order must be between 0 and {MAX_MARKOV_ORDER}")
+        if isinstance(text, str):
+            codes = self.tp.normalize(text, "codes_folded")
+        else:
+            codes = bytes(text).translate(self.fold_table)
+        results = []
+        previous = 0.0
+        grams = codes
+        for n in range(1, max_order + 2):
+            if len(grams) == 0:
+                break
+            block = self.block_entropy(self.ngram_count_values(grams, n))
+            results.append((n - 1, block - previous, block))
+            previous = block
+            grams = array.array('I', map(add, map((22).__mul__, grams[:-1]), codes[n:]))
+        return results
+
     def generate_control_text(self, length):
         """Generates a random string of Hebrew letters of given length."""
         return "".join(random.choice(self.hebrew_alphabet) for _ in range(length))
@@ -55,6 +128,25 @@ class EntropyLab:
         print("Interpretation: This indicates structural 'redundancy' or 'grammar', which is expected in language.")
         # But maybe we can frame it as "Compression Potential".
 
+        # 3. Markov entropy: how predictable is a letter given the ones before it
+        print("\nConditional entropy H(X | previous k letters):")
+        control = dict((k, h) for k, h, _ in self.markov_entropies(control_text))
+        for k, h, _ in self.markov_entropies(torah_text):
+            print(f"   k={k}: Torah {h:.4f}  Control {control.get(k, 0):.4f} bits/symbol")
+
+    def run_corpus(self, max_order=MAX_MARKOV_ORDER):
+        """Markov entropies of the whole Tanakh, straight from the cached letter codes."""
+        codes = TorahLoader().load_corpus()
+        started = time.time()
+        results = self.markov_entropies(codes, max_order)
+        print(f"Tanakh Markov entropies ({len(codes)} letters, {time.time() - started:.1f}s):")
+        for k, h, block in results:
+            print(f"   k={k}: H = {h:.4f} bits/symbol  (block entropy of {k + 1}-grams {block:.4f})")
+
 if __name__ == "__main__":
+    import sys
     lab = EntropyLab()
-    lab.run_experiment()
+    if "--tanakh" in sys.argv:
+        lab.run_corpus()
+    else:
+        lab.run_experiment()
@@ -0,0 +1,151 @@
+import array
+import json
+import math
+import os
+import sys
+from itertools import islice
+
+
+class EntropyProfile:
+    """
+    Shannon entropy of a sliding window over a letter stream.
+
+    The window keeps rolling symbol counts c and the sum S = sum(c * log2 c),
+    so its entropy is log2(W) - S / W. Sliding by one letter changes two
+    counts, and S is updated from a precomputed table of c * log2 c
+    differences: O(1) per letter, one linear pass for the whole Tanakh
+    whatever the window size. values[i] is the entropy (bits per letter) of
+    the window starting at i * stride.
+    """
+    def __init__(self, text, window=1000, stride=1):
+        if window < 1 or stride < 1:
+            raise ValueError("window and stride must be at least 1")
+        self.symbols = text.encode('iso8859_8') if isinstance(text, str) else bytes(text)
+        self.window = window
+        self.stride = stride
+        self.values = None
+
+    @classmethod
+    def from_loader(cls, loader, **kwargs):
+        return cls(loader.load_stream(), **kwargs)
+
+    def compute(self):
+        """Fills and returns self.values, an array('d') with one entropy per window."""
+        symbols, w = self.symbols, self.window
+        values = array.array('d')
+        if len(symbols) < w:
+            self.values = values
+            return values
+        clogc = [c * math.log2(c) if c else 0.0 for c in range(w + 1)]
+        grow = [clogc[c + 1] - clogc[c] for c in range(w)]
+        shrink = [0.0] + [clogc[c - 1] - clogc[c] for c in range(1, w + 1)]
+        log_w = math.log2(w)
+
+        counts = [0] * 256
+        for s in symbols[:w]:
+            counts[s] += 1
+        total = sum(clogc[c] for c in counts)
+        values.append(log_w - total / w)
+
+        # (letter leaving, letter entering) for every one-letter slide
+        pairs = zip(symbols, islice(symbols, w, None))
+        for _ in range((len(symbols) - w) // self.stride):
+            for out, into in islice(pairs, self.stride):
+                if out != into:
+                    c = counts[out]
+                    total += shrink[c]
+                    counts[out] = c - 1
+                    c = counts[into]
+                    total += grow[c]
+                    counts[into] = c + 1
+            values.append(log_w - total / w)
+        self.values = values
+        return values
+
+    def _values(self):
+        return self.values if self.values is not None else self.compute()
+
+    def window_range(self, start, end):
+        """Indices (range) of the windows that lie entirely within start..end-1."""
+        first = -(-start // self.stride)
+        last = (end - self.window) // self.stride
+        return range(first, min(last + 1, len(self._values())))
+
+    def summary(self, start=0, end=None):
+        """Mean/min/max entropy of the windows inside a span, with where the extremes start."""
+        values = self._values()
+        windows = self.window_range(start, len(self.symbols) if end is None else end)
+        if not windows:
+            return {'windows': 0, 'mean': None, 'min': None, 'max': None, 'min_start': None, 'max_start': None}
+        part = values[windows.start:windows.stop]
+        low = min(range(len(part)), key=part.__getitem__)
+        high = max(range(len(part)), key=part.__getitem__)
+        return {
+            'windows': len(part),
+            'mean': sum(part) / len(part),
+            'min': part[low],
+            'max': part[high],
+            'min_start': (windows.start + low) * self.stride,
+            'max_start': (windows.start + high) * self.stride,
+        }
+
+    def book_summaries(self, citations):
+        """summary() of every book, as (book name, summary) in corpus order."""
+        present = set(citations.verse_books)
+        return [(citations.display_name(b), self.summary(*citations.bounds(name)))
+                for b, name in enumerate(citations.book_names) if b in present]
+
+    def save(self, path, extra=None):
+        """
+        Writes the values as raw float64 (path + '.f64') and a JSON meta file
+        (path + '.json') with the window, stride and byte order, e.g. for
+        numpy.fromfile in a plotting notebook.
+        """
+        values = self._values()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".f64", 'wb') as f:
+            values.tofile(f)
+        meta = {
+            'window': self.window,
+            'stride': self.stride,
+            'letters': len(self.symbols),
+            'count': len(values),
+            'dtype': 'float64',
+            'byteorder': sys.byteorder,
+            **(extra or {}),
+        }
+        with open(path + ".json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+
+    @staticmethod
+    def load(path):
+        """Reads a saved profile back as (array('d'), meta dict)."""
+        with open(path + ".json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        values = array.array('d')
+        with open(path + ".f64", 'rb') as f:
+            values.frombytes(f.read())
+        if meta.get('byteorder') != sys.byteorder:
+            values.byteswap()
+        return values, meta
+
+
+if __name__ == "__main__":
+    import time
+    from torah_loader import TorahLoader
+    window = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stride = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    loader = TorahLoader()
+    profile = EntropyProfile.from_loader(loader, window=window, stride=stride)
+    started = time.time()
+    values = profile.compute()
+    print(f"{len(values)} windows of {window} letters (stride {stride}) in {time.time() - started:.2f}s")
+    citations = loader.citations
+    print(f"{'Book':<16}{'mean':>8}{'min':>8}{'max':>8}  lowest window")
+    for book, s in profile.book_summaries(citations):
+        if s['windows']:
+            where = citations.format(citations.cite(s['min_start']))
+            print(f"{book:<16}{s['mean']:8.4f}{s['min']:8.4f}{s['max']:8.4f}  {where}")
+    path = os.path.join("data", "cache", f"entropy_w{window}_s{stride}")
+    profile.save(path)
+    print(f"Saved {path}.f64")
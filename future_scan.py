@@ -1,9 +1,11 @@
 from els_search import BibleCodeScanner
+from result_cache import ELSResultCache
 from text_processor import TextProcessor
+from proximity import ProximityJoin
 
 class FutureScan:
-    def __init__(self):
-        self.scanner = BibleCodeScanner()
+    def __init__(self, result_cache=None):
+        self.scanner = BibleCodeScanner(result_cache=result_cache)
         self.tp = TextProcessor()
 
     def run(self):
@@ -27,14 +29,17 @@ class FutureScan:
         
         found_log = {}
 
+        # All targets in one pass per skip: wide range of skips 1 to 200,
+        # then backwards (negative skips)
+        hits_by_term = {hebrew: [] for hebrew in targets.values()}
+        for hit in self.scanner.search_many(flat_text, targets.values(), 1, 200):
+            hits_by_term[hit['term']].append(hit)
+        for hit in self.scanner.search_many(flat_text, targets.values(), -200, -1):
+            hits_by_term[hit['term']].append(hit)
+
         for name, hebrew in targets.items():
             output.append(f"Scanning for '{name}' ({hebrew})...")
-            # Scan wide range of skips: 1 to 200
-            results = list(self.scanner.search(flat_text, hebrew, 1, 200))
-            
-            # Also check backwards (negative skips)
-            results_neg = list(self.scanner.search(flat_text, hebrew, -200, -1))
-            all_hits = results + results_neg
+            all_hits = hits_by_term[hebrew]
             
             if all_hits:
                 output.append(f"  -> Found {len(all_hits)} hits.")
@@ -45,7 +50,8 @@ class FutureScan:
         # Cluster Analysis
         output.append("\n--- CLUSTER ANALYSIS (The 'Hidden Message') ---")
         
-        # Compare every pair of terms
+        # Compare every pair of terms: hits less than 20 letters apart
+        join = ProximityJoin()
         keys = list(found_log.keys())
         for i in range(len(keys)):
             for j in range(i+1, len(keys)):
@@ -55,16 +61,15 @@ class FutureScan:
                 hits1 = found_log[term1]
                 hits2 = found_log[term2]
                 
-                for h1 in hits1:
-                    for h2 in hits2:
-                        dist = abs(h1['start_index'] - h2['start_index'])
-                        
-                        if dist < 20:
-                            output.append(f"[!] POTENTIAL BREAKTHROUGH: '{term1}' and '{term2}' found together!")
-                            output.append(f"    {term1}: Index {h1['start_index']}, Skip {h1['skip']}")
-                            output.append(f"    {term2}: Index {h2['start_index']}, Skip {h2['skip']}")
-                            output.append(f"    Distance: {dist} letters.")
-                            output.append("-" * 30)
+                starts1 = [h['start_index'] for h in hits1]
+                starts2 = [h['start_index'] for h in hits2]
+                for a, b, dist in join.pairs(starts1, starts2, 19):
+                    h1, h2 = hits1[a], hits2[b]
+                    output.append(f"[!] POTENTIAL BREAKTHROUGH: '{term1}' and '{term2}' found together!")
+                    output.append(f"    {term1}: Index {h1['start_index']}, Skip {h1['skip']}")
+                    output.append(f"    {term2}: Index {h2['start_index']}, Skip {h2['skip']}")
+                    output.append(f"    Distance: {dist} letters.")
+                    output.append("-" * 30)
 
         final_out = "\n".join(output)
         print(final_out)
@@ -72,5 +77,6 @@ class FutureScan:
             f.write(final_out)
 
 if __name__ == "__main__":
-    scan = FutureScan()
+    import sys
+    scan = FutureScan(ELSResultCache() if "--cache" in sys.argv else None)
     scan.run()
@@ -1,3 +1,8 @@
+from itertools import accumulate
+
+# Width of each method's field in the packed tables of calculate_many
+PACKED_FIELD_BITS = 40
+
 class GematriaEngine:
     def __init__(self):
         # Standard Gematria values (Mispar Ragil)
@@ -23,35 +28,105 @@ class GematriaEngine:
             if r in self.ordinal_values:
                 self.ordinal_values[s] = self.ordinal_values[r]
 
+        # Method registry: name -> (byte value table, value added per word)
+        self.methods = {}
+        self._packed = {}
+        self.register("standard", self.values)
+        self.register("ordinal", self.ordinal_values)
+        self.register("reduced", {char: self.digit_sum(value) for char, value in self.values.items()})
+        self.register("gadol", {**self.values, 'ך': 500, 'ם': 600, 'ן': 700, 'ף': 800, 'ץ': 900})
+        self.register("kolel", self.values, per_word=1)
+        # Atbash swaps Aleph<->Tav, Bet<->Shin, ...; final forms count as their regular letter
+        atbash = dict(zip(alphabet, reversed(alphabet)))
+        self.register("atbash", {char: self.values[atbash[sophit_map.get(char, char)]]
+                                 for char in alphabet + "".join(sophit_map)})
+        # Hakadmi: each letter is worth the sum of the standard values up to it
+        running = dict(zip(alphabet, accumulate(self.values[char] for char in alphabet)))
+        self.register("hakadmi", {char: running[sophit_map.get(char, char)]
+                                  for char in alphabet + "".join(sophit_map)})
+
+    def register(self, name, values, per_word=0):
+        """
+        Adds a gematria method.
+
+        Args:
+            name (str): Method name used by calculate().
+            values (dict): Letter -> value; letters not listed count 0.
+            per_word (int): Added once per word (e.g. 1 for kolel).
+
+        The values are compiled to a 256-entry table over ISO-8859-8 bytes,
+        so calculate() is one encode and one map() with no per-letter branch.
+        """
+        table = [0] * 256
+        for char, value in values.items():
+            code = char.encode('iso8859_8', 'ignore')
+            if code:
+                table[code[0]] = value
+        self.methods[name] = (table, per_word)
+        self._packed = {}
+
+    def letter_table(self, method):
+        """Compiled byte -> value table of a method."""
+        if method not in self.methods:
+            raise ValueError(f"Unknown gematria method: {method} (choose from {', '.join(self.methods)})")
+        return self.methods[method][0]
+
     def calculate(self, text, method="standard"):
         """
         Calculates Gematria value for a given text.
-        Methods:
+        Methods (see self.methods, more can be added with register):
             - standard: Mispar Ragil (Aleph=1, Tav=400)
             - ordinal: Mispar Siduri (Aleph=1, Tav=22)
             - reduced: Mispar Katan (digit sum, Aleph=1, Tav=4)
+            - gadol: Mispar Gadol (final letters 500-900)
+            - kolel: standard plus 1 per word
+            - atbash: standard value of the Atbash-substituted letters
+            - hakadmi: Mispar Hakadmi (each letter is the sum of all values up to it)
         """
-        total = 0
+        table = self.letter_table(method)
         text = text.strip()
-        
-        for char in text:
-            if char in self.values:
-                val = 0
-                if method == "standard":
-                    val = self.values[char]
-                elif method == "ordinal":
-                    val = self.ordinal_values.get(char, 0)
-                elif method == "reduced":
-                    # Reduced is sum of digits of standard value, then reduced again until single digit?
-                    # Or typically: value % 9 (with 0 becoming 9)?
-                    # Mispar Katan usually treats TAV (400) as 4+0+0=4.
-                    std_val = self.values[char]
-                    val = self.digit_sum(std_val)
-                
-                total += val
-                
+        total = sum(map(table.__getitem__, text.encode('iso8859_8', 'ignore')))
+        per_word = self.methods[method][1]
+        if per_word:
+            total += per_word * self.count_words(text)
         return total
 
+    def calculate_many(self, texts, methods=None):
+        """
+        Evaluates several methods for a batch of texts.
+
+        The method tables are packed into one table whose entries hold every
+        method's value in its own 40-bit field, so each text is summed once
+        for all methods and the fields are split afterwards.
+
+        Returns:
+            list: One {method: value} dict per text, in order.
+        """
+        methods = tuple(methods or self.methods)
+        if methods not in self._packed:
+            packed = [0] * 256
+            for i, method in enumerate(methods):
+                for code, value in enumerate(self.letter_table(method)):
+                    packed[code] |= value << (i * PACKED_FIELD_BITS)
+            self._packed[methods] = packed
+        packed = self._packed[methods]
+        field = (1 << PACKED_FIELD_BITS) - 1
+        per_word = [self.methods[method][1] for method in methods]
+
+        results = []
+        for text in texts:
+            text = text.strip()
+            total = sum(map(packed.__getitem__, text.encode('iso8859_8', 'ignore')))
+            words = self.count_words(text) if any(per_word) else 0
+            results.append({method: ((total >> (i * PACKED_FIELD_BITS)) & field) + per_word[i] * words
+                            for i, method in enumerate(methods)})
+        return results
+
+    def count_words(self, text):
+        """Number of whitespace-separated words that contain a letter."""
+        table = self.methods["standard"][0]
+        return sum(1 for word in text.split() if any(map(table.__getitem__, word.encode('iso8859_8', 'ignore'))))
+
     def digit_sum(self, n):
         """Helper for reduced gematria."""
         s = sum(int(digit) for digit in str(n))
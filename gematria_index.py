@@ -0,0 +1,74 @@
+import array
+from itertools import accumulate, chain
+from operator import sub
+from gematria import GematriaEngine
+
+class GematriaIndex:
+    """
+    Prefix sums of gematria letter values over a letter stream.
+
+    For each method the letters are mapped to their values through the
+    method's compiled GematriaEngine table (one map() over the ISO-8859-8
+    bytes) and summed with accumulate(), so prefix[method][i] is the value of
+    the first i letters. The value of any
+    span - a word, a verse, a whole book - is then prefix[end] - prefix[start],
+    and the value of every word at once is two map()s over the word offsets.
+    """
+    def __init__(self, text, word_starts=None, methods=("standard", "ordinal", "reduced"), engine=None):
+        self.engine = engine or GematriaEngine()
+        self.text = text
+        self.symbols = text.encode('iso8859_8')
+        self.length = len(self.symbols)
+        self.word_starts = array.array('I', word_starts) if word_starts is not None else None
+        self.prefix = {}
+        for method in methods:
+            self.add_method(method)
+
+    @classmethod
+    def from_words(cls, words, **kwargs):
+        """Builds the index over a list of words, e.g. normalize(raw, "tokens").split()."""
+        word_starts = list(accumulate(chain([0], map(len, words))))[:-1]
+        return cls("".join(words), word_starts, **kwargs)
+
+    def add_method(self, method):
+        table = self.engine.letter_table(method)
+        self.prefix[method] = array.array('q', accumulate(map(table.__getitem__, self.symbols), initial=0))
+
+    def _prefix(self, method):
+        if method not in self.prefix:
+            self.add_method(method)
+        return self.prefix[method]
+
+    def span(self, start, end, method="standard"):
+        """Gematria of the letters start..end-1 (letter values only, no per-word bonus)."""
+        prefix = self._prefix(method)
+        return prefix[end] - prefix[start]
+
+    def spans(self, starts, ends, method="standard"):
+        """Gematria of many spans at once; returns a list."""
+        prefix = self._prefix(method)
+        return list(map(sub, map(prefix.__getitem__, ends), map(prefix.__getitem__, starts)))
+
+    def word_ends(self):
+        return chain(self.word_starts[1:], [self.length])
+
+    def word_span(self, word):
+        end = self.word_starts[word + 1] if word + 1 < len(self.word_starts) else self.length
+        return self.word_starts[word], end
+
+    def word_value(self, word, method="standard"):
+        return self.span(*self.word_span(word), method) + self.engine.methods[method][1]
+
+    def word_values(self, method="standard"):
+        """array('q') with the gematria of every word, in order."""
+        if self.word_starts is None:
+            raise ValueError("The index was built without word boundaries")
+        values = self.spans(self.word_starts, self.word_ends(), method)
+        per_word = self.engine.methods[method][1]
+        if per_word:
+            values = map(per_word.__add__, values)
+        return array.array('q', values)
+
+    def words(self):
+        """The words of the stream as strings."""
+        return list(map(self.text.__getitem__, map(slice, self.word_starts, self.word_ends())))
@@ -0,0 +1,160 @@
+import array
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, repeat
+from operator import and_, lshift, or_, rshift, sub
+from gematria_index import GematriaIndex
+
+class GematriaLookup:
+    """
+    Reverse gematria: from a value to the words and phrases that have it.
+
+    Per method, the word values are kept sorted alongside their word ids, so
+    the words equal to a value are one bisect away. Phrases (runs of
+    consecutive words) work the same way: the sum of every window of 2 to
+    max_phrase_words words is taken from the running total of word values
+    (totals[i + m] - totals[i]) and the window sums are kept sorted with their
+    (first word, word count).
+
+    Longer phrases are found from the totals directly: a run i..j-1 sums to
+    the target exactly when totals[i] + target is itself a total, which is
+    found for all i at once with one set intersection. The totals never
+    decrease, so words worth 0 (possible with registered methods) only make
+    runs of equal totals, and the indices of a total are two bisects away.
+
+    With a CorpusCache the tables are saved next to the corpus and loaded
+    from it afterwards (they are dropped when the corpus is rebuilt). Their
+    keys carry a digest of the letters and word starts, so a cache shared by
+    different texts never hands one text's tables to another.
+    """
+    def __init__(self, text, word_starts, cache=None, methods=("standard", "ordinal", "reduced"), max_phrase_words=10, engine=None):
+        if not 2 <= max_phrase_words <= 15:
+            raise ValueError("max_phrase_words must be between 2 and 15")
+        self.index = GematriaIndex(text, word_starts, methods=(), engine=engine)
+        stream = hashlib.sha256(self.index.symbols)
+        stream.update(self.index.word_starts.tobytes())
+        self.digest = stream.hexdigest()[:16]
+        self.cache = cache
+        self.max_phrase_words = max_phrase_words
+        self.tables = {}
+        self.phrase_tables = {}
+        self._totals = {}
+        for method in methods:
+            self.load_method(method)
+
+    @classmethod
+    def from_loader(cls, loader, **kwargs):
+        text = loader.load_stream()
+        return cls(text, loader.citations.word_starts, loader.cache, **kwargs)
+
+    def load_method(self, method):
+        """Loads (or builds and saves) the sorted value table of a method."""
+        keys = [f"gematria.{self.digest}.{method}.{part}" for part in ("values", "words", "totals")]
+        arrays = [self.cache.load_array(key) for key in keys] if self.cache else [None]
+        if any(arr is None for arr in arrays):
+            values = self.index.word_values(method)
+            order = array.array('I', sorted(range(len(values)), key=values.__getitem__))
+            arrays = [array.array('q', map(values.__getitem__, order)), order,
+                      array.array('q', accumulate(values, initial=0))]
+            if self.cache:
+                self.cache.save_arrays(dict(zip(keys, arrays)))
+        self.tables[method] = arrays
+
+    def _table(self, method):
+        if method not in self.tables:
+            self.load_method(method)
+        return self.tables[method]
+
+    def lookup(self, value, method="standard"):
+        """Ids (ascending) of every word whose value equals value."""
+        values, words, _ = self._table(method)
+        # The sort by value was stable, so equal values keep their ids in order
+        return list(words[bisect_left(values, value):bisect_right(values, value)])
+
+    def words(self, value, method="standard"):
+        """Distinct words with the value, as [(word, occurrences)], most frequent first."""
+        counts = Counter(self.word_text(w) for w in self.lookup(value, method))
+        return counts.most_common()
+
+    def load_phrase_table(self, method):
+        """Loads (or builds and saves) the sorted window sums of a method."""
+        keys = [f"gematria.{self.digest}.{method}.phrase{self.max_phrase_words}.{part}" for part in ("sums", "runs")]
+        arrays = [self.cache.load_array(key) for key in keys] if self.cache else [None]
+        if any(arr is None for arr in arrays):
+            totals = self._table(method)[2]
+            # One int per window: sum in the high 32 bits, first word << 4 | count below
+            keyed = []
+            for m in range(2, self.max_phrase_words + 1):
+                firsts = range(len(totals) - m)
+                keyed.extend(map(or_, map(lshift, map(sub, totals[m:], totals), repeat(32)),
+                                 map(or_, map(lshift, firsts, repeat(4)), repeat(m))))
+            keyed.sort()
+            arrays = [array.array('I', map(rshift, keyed, repeat(32))),
+                      array.array('I', map(and_, keyed, repeat(0xFFFFFFFF)))]
+            if self.cache:
+                self.cache.save_arrays(dict(zip(keys, arrays)))
+        self.phrase_tables[method] = arrays
+
+    def phrases(self, value, method="standard", min_words=2, max_words=None):
+        """
+        Every run of min_words..max_words consecutive words summing to value.
+
+        Returns:
+            list: (first word id, word count), in text order.
+        """
+        max_words = max_words or self.max_phrase_words
+        runs = [(w, 1) for w in self.lookup(value, method)] if min_words <= 1 else []
+        if max_words > self.max_phrase_words:
+            runs.extend(self._scan_phrases(value, method, max(min_words, 2), max_words))
+        else:
+            if method not in self.phrase_tables:
+                self.load_phrase_table(method)
+            sums, packed = self.phrase_tables[method]
+            for run in packed[bisect_left(sums, value):bisect_right(sums, value)]:
+                count = run & 15
+                if min_words <= count <= max_words:
+                    runs.append((run >> 4, count))
+        runs.sort()
+        return runs
+
+    def _scan_phrases(self, value, method, min_words, max_words):
+        totals = self._table(method)[2]
+        if method not in self._totals:
+            self._totals[method] = set(totals)
+        # t - value is a total exactly where some run ending there sums to value
+        starts = self._totals[method] & set(map(sub, totals, repeat(value)))
+        runs = []
+        for total in starts:
+            end_lo, end_hi = bisect_left(totals, total + value), bisect_right(totals, total + value)
+            for first in range(bisect_left(totals, total), bisect_right(totals, total)):
+                runs.extend((first, end - first) for end in
+                            range(max(end_lo, first + min_words), min(end_hi, first + max_words + 1)))
+        return runs
+
+    def word_text(self, word):
+        start, end = self.index.word_span(word)
+        return self.index.text[start:end]
+
+    def phrase_text(self, first, count):
+        return " ".join(self.word_text(w) for w in range(first, first + count))
+
+
+if __name__ == "__main__":
+    import time
+    from torah_loader import TorahLoader
+    loader = TorahLoader()
+    started = time.time()
+    lookup = GematriaLookup.from_loader(loader)
+    print(f"Index ready in {(time.time() - started) * 1000:.0f} ms")
+    citations = loader.citations
+    for value in (376, 358, 26):
+        started = time.time()
+        words = lookup.words(value)
+        runs = lookup.phrases(value, max_words=3)
+        elapsed = (time.time() - started) * 1000
+        print(f"\n{value}: {sum(c for _, c in words)} words, {len(runs)} phrases ({elapsed:.1f} ms)")
+        print("  " + ", ".join(f"{w} x{c}" for w, c in words[:8]))
+        for first, count in runs[:5]:
+            where = citations.format(citations.cite(citations.word_starts[first]))
+            print(f"  {where}: {lookup.phrase_text(first, count)}")
@@ -0,0 +1,261 @@
+import array
+import hashlib
+import json
+import mmap
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+from operator import add, mul
+from els_index import LetterIndex
+
+# Letter ids of the corpus being indexed, in each build worker
+_worker_ids = None
+
+
+class StridedKGramIndex:
+    """
+    Persistent index of strided k-grams for fast repeated ELS lookups.
+
+    For every skip d up to max_skip, each start n is keyed by the k letters
+    at n, n + d, ..., n + (k - 1) * d (a base-|alphabet| code). The starts are
+    stored grouped by code, with an offset table per skip, so the candidates
+    for a term at one skip are a single bucket: no scan, no bisect. Only the
+    letters after the first k are checked against the text.
+
+    Backward skips are answered from the same tables by looking up the
+    reversed term. Skips beyond max_skip and terms shorter than k go to the
+    bitset search of LetterIndex.
+
+    Everything lives in one file that is memory-mapped on load, plus a meta
+    file with the corpus digest it was built from.
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir=os.path.join("data", "cache"), name="tanakh", k=3, max_skip=50):
+        self.data_path = os.path.join(cache_dir, name + ".kgram")
+        self.meta_path = os.path.join(cache_dir, name + ".kgram.json")
+        self.cache_dir = cache_dir
+        self.k = k
+        self.max_skip = max_skip
+        self.symbols = None
+        self.meta = None
+        self._tables = None
+        self._letters = None
+
+    def digest(self, symbols):
+        return hashlib.sha256(symbols).hexdigest()
+
+    def load(self, text):
+        """Maps the index for text if one was built for it. Returns True on success."""
+        symbols = text.encode('iso8859_8')
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.data_path):
+            return False
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta.get('version') != self.FORMAT_VERSION or meta.get('corpus') != self.digest(symbols):
+            return False
+        if meta['k'] != self.k or meta['max_skip'] < self.max_skip:
+            return False
+        if os.path.getsize(self.data_path) != meta['size']:
+            return False
+        with open(self.data_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        words = memoryview(mm).cast('I')
+        self._tables = {}
+        for d, (offsets_at, positions_at, count) in meta['skips'].items():
+            buckets = meta['buckets']
+            self._tables[int(d)] = (words[offsets_at:offsets_at + buckets + 1],
+                                    words[positions_at:positions_at + count])
+        self.meta = meta
+        self._attach(symbols)
+        return True
+
+    def _attach(self, symbols):
+        self.symbols = symbols
+        self._letters = LetterIndex(symbols)
+        self._ids = {s: i for i, s in enumerate(self.meta['alphabet'])}
+
+    def build(self, text, workers=None):
+        """
+        Builds and saves the index for text.
+
+        Returns:
+            dict: build time (s), size on disk (bytes), skips and k.
+        """
+        started = time.time()
+        symbols = text.encode('iso8859_8')
+        alphabet = sorted(set(symbols))
+        buckets = len(alphabet) ** self.k
+        skips = list(range(1, self.max_skip + 1))
+        workers = workers or os.cpu_count() or 1
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_data = self.data_path + ".tmp"
+        layout = {}
+        at = 0
+        with open(tmp_data, 'wb') as f:
+            if workers > 1 and len(skips) > 1:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, len(symbols)))
+                try:
+                    shm.buf[:len(symbols)] = symbols
+                    with ProcessPoolExecutor(max_workers=workers, initializer=_attach_ids,
+                                             initargs=(shm.name, len(symbols), alphabet)) as pool:
+                        tables = pool.map(_build_skip, skips, repeat(self.k), repeat(len(alphabet)))
+                        for d, (offsets, positions) in zip(skips, tables):
+                            at = self._write_skip(f, layout, d, offsets, positions, at)
+                finally:
+                    shm.close()
+                    shm.unlink()
+            else:
+                _attach_ids(None, len(symbols), alphabet, symbols)
+                for d in skips:
+                    offsets, positions = _build_skip(d, self.k, len(alphabet))
+                    at = self._write_skip(f, layout, d, offsets, positions, at)
+
+        meta = {
+            'version': self.FORMAT_VERSION,
+            'corpus': self.digest(symbols),
+            'k': self.k,
+            'max_skip': self.max_skip,
+            'alphabet': alphabet,
+            'buckets': buckets,
+            'size': at * 4,
+            'skips': layout,
+        }
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_data, self.data_path)
+        os.replace(tmp_meta, self.meta_path)
+        self.load(text)
+        return {
+            'build_time': time.time() - started,
+            'bytes': os.path.getsize(self.data_path) + os.path.getsize(self.meta_path),
+            'skips': self.max_skip,
+            'k': self.k,
+        }
+
+    def _write_skip(self, f, layout, d, offsets, positions, at):
+        """Appends one skip's tables; returns the new end position (in 4-byte words)."""
+        layout[d] = (at, at + len(offsets), len(positions))
+        offsets.tofile(f)
+        positions.tofile(f)
+        return at + len(offsets) + len(positions)
+
+    def load_or_build(self, text, workers=None):
+        """Returns None if a saved index was loaded, else the build stats."""
+        if self.load(text):
+            return None
+        return self.build(text, workers)
+
+    def _bucket(self, term):
+        """Bucket code of the first k letters of term (bytes), or None if a letter is not indexed."""
+        code = 0
+        for symbol in term[:self.k]:
+            if symbol not in self._ids:
+                return None
+            code = code * len(self._ids) + self._ids[symbol]
+        return code
+
+    def _starts(self, term, d):
+        """Ascending starts of term (bytes) at a positive indexed skip d."""
+        code = self._bucket(term)
+        if code is None:
+            return []
+        offsets, positions = self._tables[d]
+        symbols = self.symbols
+        candidates = positions[offsets[code]:offsets[code + 1]]
+        if len(term) == self.k:
+            return list(candidates)
+        last = len(symbols) - (len(term) - 1) * d
+        rest = range(self.k, len(term))
+        return [n for n in candidates
+                if n < last and all(symbols[n + j * d] == term[j] for j in rest)]
+
+    def search(self, term, min_skip=1, max_skip=100):
+        """
+        Same hits and order as BibleCodeScanner.search over the indexed text.
+
+        Yields:
+            dict: { 'term': term, 'start_index': n, 'skip': d }
+        """
+        if self.symbols is None:
+            raise RuntimeError("Index not loaded: call load() or build() first")
+        if not term:
+            return
+        try:
+            symbols = term.encode('iso8859_8')
+        except UnicodeEncodeError:
+            return
+        backward = symbols[::-1]
+        for d in range(min_skip, max_skip + 1):
+            if d == 0: continue
+            if len(symbols) < self.k or abs(d) not in self._tables:
+                starts = self._letters.starts(symbols, d)
+            elif d > 0:
+                starts = self._starts(symbols, d)
+            else:
+                # A backward hit is the reversed term read forward from its last letter
+                shift = (len(symbols) - 1) * -d
+                starts = [n + shift for n in self._starts(backward, -d)]
+            for n in starts:
+                yield {
+                    'term': term,
+                    'start_index': n,
+                    'skip': d
+                }
+
+    def stats(self):
+        if self.meta is None:
+            return None
+        return {'bytes': self.meta['size'], 'skips': self.meta['max_skip'], 'k': self.meta['k']}
+
+
+def _attach_ids(name, length, alphabet, symbols=None):
+    """Pool initializer: turns the shared corpus into letter ids 0..len(alphabet)-1."""
+    global _worker_ids
+    if symbols is None:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            symbols = bytes(shm.buf[:length])
+        finally:
+            shm.close()
+    table = bytearray(256)
+    for i, symbol in enumerate(alphabet):
+        table[symbol] = i
+    _worker_ids = list(symbols.translate(table))
+
+
+def _build_skip(d, k, base):
+    """Offsets and starts grouped by k-gram code for skip d."""
+    ids = _worker_ids
+    count = max(0, len(ids) - (k - 1) * d)
+    codes = ids[:count]
+    for j in range(1, k):
+        codes = list(map(add, map(mul, codes, repeat(base)), ids[j * d:j * d + count]))
+    # sorted() is stable, so every bucket keeps its starts ascending
+    order = sorted(range(count), key=codes.__getitem__)
+    grouped = list(map(codes.__getitem__, order))
+    offsets = array.array('I', map(bisect_left, repeat(grouped), range(base ** k + 1)))
+    return offsets, array.array('I', order)
+
+
+if __name__ == "__main__":
+    from torah_loader import TorahLoader
+    loader = TorahLoader()
+    text = loader.load_full_torah()
+    index = StridedKGramIndex(max_skip=50)
+    built = index.load_or_build(text, loader.workers)
+    if built:
+        print(f"Built k={built['k']} index for skips 1..{built['skips']} in {built['build_time']:.1f}s "
+              f"({built['bytes'] / 1e6:.1f} MB)")
+    for term in ("תורה", "אור", "משיח"):
+        started = time.time()
+        hits = list(index.search(term, -50, 50))
+        print(f"{term}: {len(hits)} hits in {(time.time() - started) * 1000:.1f} ms")
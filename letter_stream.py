@@ -0,0 +1,75 @@
+import array
+from itertools import chain, repeat
+from operator import sub
+
+# Streams TorahLoader.load_stream can build from the corpus
+STREAMS = {
+    "letters": "every letter of the corpus (the main stream)",
+    "word_initials": "first letter of every word",
+    "word_finals": "last letter of every word",
+    "verse_initials": "first letter of every verse",
+    "reversed": "the corpus read from the last letter to the first",
+}
+
+
+class LetterStream(str):
+    """
+    A string of Hebrew letters derived from the corpus, e.g. the first letter
+    of every word.
+
+    Being a str, it goes straight into every engine (ELS search, gematria,
+    entropy, ...). back_map[i] is the offset in the main corpus stream of the
+    stream's i-th letter, so results can be traced back to the text (and to a
+    verse via CitationIndex). The main stream itself has no back map.
+    """
+    def __new__(cls, text, name="letters", back_map=None):
+        stream = super().__new__(cls, text)
+        stream.name = name
+        stream.back_map = back_map
+        return stream
+
+    def corpus_offset(self, i):
+        return self.back_map[i] if self.back_map is not None else i
+
+    def corpus_offsets(self, indices):
+        if self.back_map is None:
+            return list(indices)
+        return list(map(self.back_map.__getitem__, indices))
+
+    def annotate(self, hits):
+        """Adds 'corpus_index' (start offset in the main stream) to ELS hit dicts (in place)."""
+        hits = list(hits)
+        for hit, offset in zip(hits, self.corpus_offsets(h['start_index'] for h in hits)):
+            hit['corpus_index'] = offset
+        return hits
+
+    def every(self, step, start=0):
+        """Every step-th letter of the stream, e.g. the initials of every 7th word."""
+        back_map = self.back_map if self.back_map is not None else range(len(self))
+        return LetterStream(str(self)[start::step], f"{self.name}[{start}::{step}]",
+                            array.array('I', back_map[start::step]))
+
+
+def derive_stream(name, codes, citations):
+    """
+    Picks the letters of a derived stream out of the corpus letter codes.
+
+    Returns:
+        tuple: (letter codes as bytes, array('I') back map into the corpus)
+    """
+    length = len(codes)
+    if name == "word_initials":
+        offsets = citations.word_starts
+    elif name == "word_finals":
+        ends = chain(citations.word_starts[1:], [length])
+        offsets = array.array('I', map(sub, ends, repeat(1)))
+    elif name == "verse_initials":
+        # Verses without letters share their start with the next verse
+        starts = citations.verse_starts
+        nexts = chain(starts[1:], [length])
+        offsets = array.array('I', (s for s, n in zip(starts, nexts) if n > s))
+    elif name == "reversed":
+        offsets = array.array('I', range(length - 1, -1, -1))
+    else:
+        raise ValueError(f"Unknown stream: {name} (choose from {', '.join(STREAMS)})")
+    return bytes(map(codes.__getitem__, offsets)), offsets
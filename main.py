@@ -1,16 +1,18 @@
 import sys
 import os
+import time
 from text_processor import TextProcessor
 from gematria import GematriaEngine
-from els_search import BibleCodeScanner
-from ciphers import CipherEngine
+from ciphers import CipherEngine, CLASSIC_CIPHERS
+from kgram_index import StridedKGramIndex
 
 class TorahWorkbenchApp:
     def __init__(self):
         self.text_processor = TextProcessor()
         self.gematria_engine = GematriaEngine()
-        self.els_scanner = BibleCodeScanner()
         self.cipher_engine = CipherEngine()
+        # Strided k-gram index for ELS lookups, loaded or built on first use
+        self.kgram_index = None
         self.loaded_text = ""
         self.flat_text = ""
 
@@ -37,7 +39,7 @@ class TorahWorkbenchApp:
             print("\nSelect Mode:")
             print("1. Gematria Calculator")
             print("2. ELS Search (Bible Codes)")
-            print("3. Cipher Tools (Atbash/Albam)")
+            print("3. Cipher Tools (Atbash/Albam/Atbah/Avgad)")
             print("4. Exit")
             
             choice = input("Enter choice: ")
@@ -65,23 +67,34 @@ class TorahWorkbenchApp:
         print(f"Ordinal (Siduri): {ord_val}")
         print(f"Reduced (Katan):  {red_val}")
 
+    def get_kgram_index(self):
+        if self.kgram_index is None:
+            self.kgram_index = StridedKGramIndex(name="workbench", max_skip=100)
+            built = self.kgram_index.load_or_build(self.flat_text)
+            if built:
+                print(f"Built ELS index (skips 1-{built['skips']}) in {built['build_time']:.2f}s, "
+                      f"{built['bytes'] / 1024:.0f} KB on disk.")
+        return self.kgram_index
+
     def mode_els(self):
         term = input("Enter search term (Hebrew): ")
         max_dist = input("Max skip distance (default 50): ")
         max_dist = int(max_dist) if max_dist.isdigit() else 50
         
+        index = self.get_kgram_index()
         print(f"Searching for '{term}' with max skip {max_dist}...")
-        results = list(self.els_scanner.search(self.flat_text, term, 1, max_dist))
+        started = time.time()
+        results = list(index.search(term, 1, max_dist))
         # Also search negative skips (backward)
-        # results += list(self.els_scanner.search(self.flat_text, term, -max_dist, -1))
         # Range in python for negative: range(-1, -max_dist -1, -1)
         # My scanner takes explicit min/max ranges.
         # Let's just do a second pass for negative to be simple or pass range explicitly if scanner supports it.
         # The scanner uses range(min, max+1). 
         # So for negative: min=-50, max=-1.
         
-        results_neg = list(self.els_scanner.search(self.flat_text, term, -max_dist, -1))
+        results_neg = list(index.search(term, -max_dist, -1))
         all_results = results + results_neg
+        print(f"Query time: {(time.time() - started) * 1000:.1f} ms")
         
         if not all_results:
             print("No sequences found.")
@@ -92,12 +105,9 @@ class TorahWorkbenchApp:
 
     def mode_cipher(self):
         text = input("Enter text to encipher: ")
-        atbash = self.cipher_engine.atbash(text)
-        albam = self.cipher_engine.albam(text)
-        
         print(f"Original: {text}")
-        print(f"Atbash:   {atbash}")
-        print(f"Albam:    {albam}")
+        for name in CLASSIC_CIPHERS:
+            print(f"{name.capitalize() + ':':<9} {self.cipher_engine.encipher(text, name)}")
 
 if __name__ == "__main__":
     app = TorahWorkbenchApp()
@@ -1,21 +1,15 @@
 import collections
 from els_search import BibleCodeScanner
+from result_cache import ELSResultCache
 from text_processor import TextProcessor
-from gematria import GematriaEngine
+from gematria_index import GematriaIndex
+from number_stats import PrimeSieve
 
 class MysteryScan:
-    def __init__(self):
-        self.scanner = BibleCodeScanner()
+    def __init__(self, result_cache=None):
+        self.scanner = BibleCodeScanner(result_cache=result_cache)
         self.tp = TextProcessor()
-        self.ge = GematriaEngine()
         
-    def is_prime(self, n):
-        if n < 2: return False
-        for i in range(2, int(n**0.5) + 1):
-            if n % i == 0:
-                return False
-        return True
-
     def run(self):
         output = []
         output.append("Initiating Deep Pattern Scan of Genesis Chapter 1...\n")
@@ -27,8 +21,14 @@ class MysteryScan:
         
         # 1. The Famous "TORH" Code
         target = "תורה" 
+        target_light = "אור"
+        # Both targets share one scan of skips 1-100
+        hits_by_term = {target: [], target_light: []}
+        for hit in self.scanner.search_many(flat_text, [target, target_light], 1, 100):
+            hits_by_term[hit['term']].append(hit)
+
         output.append(f"\n[1] Hunting for '{target}' (TORAH)...")
-        found = list(self.scanner.search(flat_text, target, 1, 100))
+        found = hits_by_term[target]
         
         if found:
             output.append(f"   Success! Found {len(found)} occurrences.")
@@ -40,30 +40,28 @@ class MysteryScan:
             output.append("   No occurrences found in this range.")
 
         # 2. The "Light" Anomaly
-        target_light = "אור"
         output.append(f"\n[2] Hunting for '{target_light}' (LIGHT)...")
-        found_light = list(self.scanner.search(flat_text, target_light, 1, 100))
+        found_light = hits_by_term[target_light]
         output.append(f"   Found {len(found_light)} occurrences of 'Light' in ELS.")
         
         # 3. Prime Number Gematria Density
         output.append(f"\n[3] Analyzing Prime Number Density in explicit text...")
         
-        words = raw.split()
-        total_words = 0
+        # Whitespace-separated words (maqaf joins), letters only; words without
+        # letters drop out, and all word values come from one prefix-sum index
+        words = self.tp.normalize(raw, "tokens").split()
+        values = GematriaIndex.from_words(words, methods=("standard",)).word_values("standard")
+        # Primality comes from one sieve up to the largest value, not trial division per word
+        sieve = PrimeSieve(max(values, default=0))
+        total_words = len(words)
         prime_words = 0
         prime_hits = []
         
-        for w in words:
-            clean_w = self.tp.strip_niqqud(w)
-            clean_w = clean_w.replace('־', '').replace('.', '').replace(',', '')
-            val = self.ge.calculate(clean_w, "standard")
-            
-            if val > 0:
-                total_words += 1
-                if self.is_prime(val):
-                    prime_words += 1
-                    if len(prime_hits) < 10: 
-                        prime_hits.append(f"{clean_w}({val})")
+        for w, val in zip(words, values):
+            if sieve.is_prime(val):
+                prime_words += 1
+                if len(prime_hits) < 10: 
+                    prime_hits.append(f"{w}({val})")
 
         density = (prime_words / total_words) * 100 if total_words else 0
         output.append(f"   Total Words Analyzed: {total_words}")
@@ -77,5 +75,6 @@ class MysteryScan:
             f.write(final_output)
 
 if __name__ == "__main__":
-    scan = MysteryScan()
+    import sys
+    scan = MysteryScan(ELSResultCache() if "--cache" in sys.argv else None)
     scan.run()
@@ -0,0 +1,222 @@
+import math
+import random
+from bisect import bisect_left
+from itertools import accumulate, compress, takewhile, count
+from operator import sub
+from gematria_index import GematriaIndex
+from significance import NullTextGenerator, NULL_MODELS
+
+# Number properties tested on every word value; each gets one bit in the property table
+PROPERTIES = ("prime", "triangular", "square", "fibonacci", "multiple_of_7")
+
+LEVELS = ("book", "chapter")
+
+
+class PrimeSieve:
+    """Sieve of Eratosthenes over a bytearray: flags[n] is 1 when n is prime."""
+    def __init__(self, limit):
+        self.limit = max(limit, 1)
+        flags = bytearray([1]) * (self.limit + 1)
+        flags[0] = flags[1] = 0
+        for i in range(2, math.isqrt(self.limit) + 1):
+            if flags[i]:
+                flags[i * i::i] = bytes(len(range(i * i, self.limit + 1, i)))
+        self.flags = flags
+
+    def is_prime(self, n):
+        if n > self.limit:
+            raise ValueError(f"{n} is beyond the sieve limit {self.limit}")
+        return n >= 0 and self.flags[n] == 1
+
+    def primes(self):
+        return list(compress(range(self.limit + 1), self.flags))
+
+
+def property_table(limit):
+    """
+    One byte per number 0..limit with bit i set when the number has PROPERTIES[i].
+
+    Returns:
+        tuple: (table as bytes, PrimeSieve used for the prime bit)
+    """
+    sieve = PrimeSieve(limit)
+    table = bytearray(limit + 1)
+    members = {
+        "prime": sieve.primes(),
+        "triangular": takewhile(limit.__ge__, accumulate(count(1))),
+        "square": takewhile(limit.__ge__, map(lambda n: n * n, count(1))),
+        "fibonacci": takewhile(limit.__ge__, _fibonacci()),
+        "multiple_of_7": range(7, limit + 1, 7),
+    }
+    for bit, name in enumerate(PROPERTIES):
+        for n in members[name]:
+            table[n] |= 1 << bit
+    return bytes(table), sieve
+
+
+def _fibonacci():
+    a, b = 1, 2
+    while True:
+        yield a
+        a, b = b, a + b
+
+
+def group_starts(citations, level="book"):
+    """
+    Labels and first word ids of the books (or chapters) of the corpus.
+
+    Returns:
+        list: (label, first word id) in corpus order
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level: {level} (choose from {', '.join(LEVELS)})")
+    groups = []
+    last = None
+    for start, book, chapter in zip(citations.verse_starts, citations.verse_books, citations.verse_chapters):
+        key = (book, chapter) if level == "chapter" else book
+        if key != last:
+            name = citations.display_name(book)
+            groups.append((f"{name} {chapter}" if level == "chapter" else name,
+                           bisect_left(citations.word_starts, start)))
+            last = key
+    return groups
+
+
+class NumberStats:
+    """
+    Densities of number properties (prime, triangular, ...) among word gematria.
+
+    Word values come from one GematriaIndex pass over the whole corpus. Each
+    value is looked up once in a property table (one byte per number, one bit
+    per property) that covers the largest value, so all properties are tested
+    in a single map(). Per property the flag bytes are turned into 0/1 with
+    bytes.translate and prefix-summed, and the count of every book or chapter
+    is a difference of two prefix sums at its word boundaries.
+
+    Null texts from significance.NullTextGenerator go through the same
+    pipeline, so the observed densities can be compared to what the letter
+    (or word) frequencies alone would give.
+    """
+    def __init__(self, text, word_starts, groups=None, method="standard", engine=None):
+        self.text = text
+        self.word_starts = word_starts
+        self.method = method
+        self.engine = engine
+        self.groups = groups or [("All", 0)]
+        self.labels = [label for label, _ in self.groups]
+        self.firsts = [first for _, first in self.groups]
+        self.ends = self.firsts[1:] + [len(word_starts)]
+        self.values = self.word_values(text)
+        self.table, self.sieve = property_table(max(self.values, default=0))
+        # bytes.translate tables that turn a flag byte into 0/1 for one property
+        self.bit_tables = [bytes((n >> bit) & 1 for n in range(256)) for bit in range(len(PROPERTIES))]
+
+    @classmethod
+    def from_loader(cls, loader, level="book", **kwargs):
+        text = loader.load_stream()
+        return cls(text, loader.citations.word_starts, group_starts(loader.citations, level), **kwargs)
+
+    def word_values(self, text):
+        index = GematriaIndex(text, self.word_starts, methods=(self.method,), engine=self.engine)
+        return index.word_values(self.method)
+
+    def flags(self, values):
+        """Property bits of every value, as bytes."""
+        top = max(values, default=0)
+        if top >= len(self.table):
+            self.table, self.sieve = property_table(max(top, 2 * len(self.table)))
+        return bytes(map(self.table.__getitem__, values))
+
+    def counts(self, values):
+        """{property: [count per group]} for a list of word values."""
+        flags = self.flags(values)
+        result = {}
+        for name, bits in zip(PROPERTIES, self.bit_tables):
+            prefix = list(accumulate(flags.translate(bits), initial=0))
+            result[name] = list(map(sub, map(prefix.__getitem__, self.ends), map(prefix.__getitem__, self.firsts)))
+        return result
+
+    def run(self, null_model="letters", trials=20, seed=0):
+        """
+        Args:
+            null_model (str): One of significance.NULL_MODELS, or None to skip.
+            trials (int): Number of null texts (trial i uses seed + i).
+
+        Returns:
+            dict: words per group, observed counts per property and group,
+                  and per property the null mean/stdev of the overall count,
+                  the mean count per group and a two-sided p-value.
+        """
+        observed = self.counts(self.values)
+        result = {
+            'groups': self.labels,
+            'words': list(map(sub, self.ends, self.firsts)),
+            'observed': observed,
+            'null_model': null_model,
+            'trials': trials if null_model else 0,
+            'null': {},
+        }
+        if not null_model or not trials:
+            return result
+        if null_model not in NULL_MODELS:
+            raise ValueError(f"Unknown null model: {null_model} (choose from {', '.join(NULL_MODELS)})")
+
+        nulls = NullTextGenerator(self.text.encode('iso8859_8'), self.word_starts)
+        totals = {name: [] for name in PROPERTIES}
+        group_sums = {name: [0] * len(self.groups) for name in PROPERTIES}
+        for i in range(trials):
+            if null_model == "words":
+                # Shuffled words move the word boundaries, so shuffle their values instead
+                values = list(self.values)
+                random.Random(seed + i).shuffle(values)
+            else:
+                values = self.word_values(nulls.generate(null_model, seed + i).decode('iso8859_8'))
+            for name, counts in self.counts(values).items():
+                totals[name].append(sum(counts))
+                group_sums[name] = list(map(int.__add__, group_sums[name], counts))
+
+        for name in PROPERTIES:
+            null_counts = totals[name]
+            mean = sum(null_counts) / trials
+            stdev = math.sqrt(sum((c - mean) ** 2 for c in null_counts) / (trials - 1)) if trials > 1 else 0
+            distance = abs(sum(observed[name]) - mean)
+            result['null'][name] = {
+                'mean': mean,
+                'stdev': stdev,
+                'group_means': [s / trials for s in group_sums[name]],
+                'p_value': (1 + sum(1 for c in null_counts if abs(c - mean) >= distance)) / (1 + trials),
+            }
+        return result
+
+    def format_report(self, result):
+        short = {"multiple_of_7": "x7"}
+        header = f"{'':<20}{'words':>8}" + "".join(f"{short.get(name, name)[:10]:>12}" for name in PROPERTIES)
+        lines = [header]
+        for g, label in enumerate(result['groups']):
+            words = result['words'][g]
+            cells = "".join(f"{100 * result['observed'][name][g] / words if words else 0:>11.2f}%" for name in PROPERTIES)
+            lines.append(f"{label:<20}{words:>8}{cells}")
+        total_words = sum(result['words'])
+        if result['null']:
+            lines.append(f"\nNull model: {result['null_model']} ({result['trials']} texts)")
+        for name in PROPERTIES:
+            observed = sum(result['observed'][name])
+            line = f"{name:<14} {100 * observed / total_words if total_words else 0:6.2f}%"
+            null = result['null'].get(name)
+            if null:
+                line += (f"  null {100 * null['mean'] / total_words:6.2f}%"
+                         f" (sd {null['stdev']:.1f} words)  p {null['p_value']:.4f}")
+            lines.append(line)
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from torah_loader import TorahLoader
+    level = sys.argv[1] if len(sys.argv) > 1 else "book"
+    started = time.time()
+    stats = NumberStats.from_loader(TorahLoader(), level)
+    result = stats.run(trials=20)
+    print(stats.format_report(result))
+    print(f"\n{len(stats.values)} words, largest value {stats.sieve.limit}, {time.time() - started:.1f}s")
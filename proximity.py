@@ -0,0 +1,133 @@
+import math
+from bisect import bisect_left, bisect_right
+from itertools import combinations
+
+class ProximityJoin:
+    """
+    Finds ELS hits that lie close to each other.
+
+    Hit positions are sorted once per term and every hit only looks at the
+    window of positions that can be within the radius (found by bisect), so a
+    join costs O(n log n) plus the number of results instead of comparing
+    every hit with every other hit.
+
+    With row_width set, positions are laid out as an ELS table of that width
+    (row = offset // width, column = offset % width) and the distance is the
+    Euclidean distance between cells; the window is then one column range per
+    row within the radius. Without it the distance is |a - b| along the text.
+    """
+    def __init__(self, row_width=None):
+        if row_width is not None and row_width < 1:
+            raise ValueError("Row width must be at least 1")
+        self.row_width = row_width
+
+    def distance(self, a, b):
+        if self.row_width is None:
+            return abs(a - b)
+        row_a, col_a = divmod(a, self.row_width)
+        row_b, col_b = divmod(b, self.row_width)
+        return math.hypot(row_a - row_b, col_a - col_b)
+
+    def _windows(self, positions, p, radius):
+        """Yields (lo, hi) index ranges of sorted positions that may lie within radius of p."""
+        if self.row_width is None:
+            yield bisect_left(positions, p - radius), bisect_right(positions, p + radius)
+            return
+        width = self.row_width
+        reach = int(radius)
+        row, col = divmod(p, width)
+        first_col, last_col = max(0, col - reach), min(width - 1, col + reach)
+        for r in range(max(0, row - reach), row + reach + 1):
+            base = r * width
+            yield bisect_left(positions, base + first_col), bisect_right(positions, base + last_col)
+
+    def _sorted(self, starts):
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        return order, [starts[i] for i in order]
+
+    def _near_sorted(self, order, positions, p, radius):
+        """Yields (original index, distance) of the sorted hits within radius of p."""
+        for lo, hi in self._windows(positions, p, radius):
+            for k in range(lo, hi):
+                dist = self.distance(p, positions[k])
+                if dist <= radius:
+                    yield order[k], dist
+
+    def pairs(self, starts_a, starts_b, radius):
+        """
+        All pairs of hits from two terms within radius of each other.
+
+        Args:
+            starts_a (list): Start offsets of the first term's hits.
+            starts_b (list): Start offsets of the second term's hits.
+            radius (float): Largest distance that still counts (inclusive).
+
+        Returns:
+            list: (index in starts_a, index in starts_b, distance), ordered
+                  by the first index, then the second.
+        """
+        if len(starts_b) > len(starts_a):
+            # Bisect into the larger list, walk the smaller one
+            return sorted((i, j, dist) for j, i, dist in self.pairs(starts_b, starts_a, radius))
+        order, positions = self._sorted(starts_a)
+        found = []
+        for j, p in enumerate(starts_b):
+            for i, dist in self._near_sorted(order, positions, p, radius):
+                found.append((i, j, dist))
+        found.sort()
+        return found
+
+    def clusters(self, groups, radius):
+        """
+        All k-term clusters: one hit from each group, every pair within radius.
+
+        The group with the fewest hits anchors the search. For each of its hits
+        the other groups are narrowed to the hits inside the anchor's window,
+        then combined smallest group first, dropping a partial cluster as soon
+        as one pair is too far apart.
+
+        Args:
+            groups (list): One list of start offsets per term.
+            radius (float): Largest pairwise distance (inclusive).
+
+        Returns:
+            list: Tuples of hit indices (one per group, in group order), sorted.
+        """
+        if not groups or any(not starts for starts in groups):
+            return []
+        if len(groups) == 1:
+            return [(i,) for i in range(len(groups[0]))]
+        anchor = min(range(len(groups)), key=lambda g: len(groups[g]))
+        others = [g for g in range(len(groups)) if g != anchor]
+        tables = {g: self._sorted(groups[g]) for g in others}
+
+        found = []
+        for a, p in enumerate(groups[anchor]):
+            candidates = []
+            for g in others:
+                near = [i for i, _ in self._near_sorted(*tables[g], p, radius)]
+                if not near:
+                    break
+                candidates.append((g, near))
+            else:
+                candidates.sort(key=lambda item: len(item[1]))
+                self._extend({anchor: a}, candidates, groups, radius, found)
+        found.sort()
+        return found
+
+    def _extend(self, chosen, candidates, groups, radius, found):
+        """Backtracking step of clusters: picks a hit of the next group."""
+        if not candidates:
+            found.append(tuple(chosen[g] for g in range(len(groups))))
+            return
+        (g, near), rest = candidates[0], candidates[1:]
+        for i in near:
+            p = groups[g][i]
+            if all(self.distance(p, groups[h][j]) <= radius for h, j in chosen.items()):
+                chosen[g] = i
+                self._extend(chosen, rest, groups, radius, found)
+                del chosen[g]
+
+    def span(self, starts):
+        """Largest pairwise distance within one cluster."""
+        return max((self.distance(a, b) for a, b in combinations(starts, 2)), default=0)
@@ -0,0 +1,123 @@
+import array
+import hashlib
+import os
+import sqlite3
+import time
+from bisect import bisect_left, bisect_right
+
+class ELSResultCache:
+    """
+    SQLite store of ELS search results.
+
+    A query is keyed by the SHA-256 of the normalized corpus, the term, the
+    direction (+1 forward, -1 backward) and the skip range lo..hi (as
+    magnitudes). Hits are kept as packed start/skip arrays ordered by skip,
+    so a cached range also answers any sub-range with two bisects.
+
+    The store is bounded: when there are more than max_queries entries or
+    more than max_hits hits in total, the least recently used entries go.
+    lookup and store only queue their writes; flush() applies them (the
+    last_used updates in one executemany) and commits, once per search.
+    """
+    def __init__(self, path=os.path.join("data", "cache", "els_results.sqlite"), max_queries=10000, max_hits=50000000):
+        self.path = path
+        self.max_queries = max_queries
+        self.max_hits = max_hits
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                id INTEGER PRIMARY KEY,
+                corpus TEXT NOT NULL,
+                term TEXT NOT NULL,
+                direction INTEGER NOT NULL,
+                lo INTEGER NOT NULL,
+                hi INTEGER NOT NULL,
+                hits INTEGER NOT NULL,
+                starts BLOB NOT NULL,
+                skips BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS query_key ON queries (corpus, term, direction)")
+        self.db.commit()
+        self._digest_text = None
+        self._digest = None
+        self._touched = {}
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def corpus_digest(self, text):
+        """SHA-256 of the flat text, remembered for the last text seen."""
+        if self._digest_text is None or not (text is self._digest_text or text == self._digest_text):
+            self._digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            self._digest_text = text
+        return self._digest
+
+    def lookup(self, corpus, term, direction, lo, hi):
+        """
+        Returns (starts, skips) arrays of the cached hits with skip magnitude
+        in lo..hi, or None if no cached range covers it.
+        """
+        row = self.db.execute(
+            "SELECT id, starts, skips FROM queries WHERE corpus = ? AND term = ? AND direction = ?"
+            " AND lo <= ? AND hi >= ? ORDER BY hi - lo LIMIT 1",
+            (corpus, term, direction, lo, hi)).fetchone()
+        if row is None:
+            return None
+        query_id, starts_blob, skips_blob = row
+        self._touched[query_id] = time.time()
+        starts, skips = array.array('I'), array.array('i')
+        starts.frombytes(starts_blob)
+        skips.frombytes(skips_blob)
+        first, last = (lo, hi) if direction > 0 else (-hi, -lo)
+        a, b = bisect_left(skips, first), bisect_right(skips, last)
+        return starts[a:b], skips[a:b]
+
+    def store(self, corpus, term, direction, lo, hi, starts, skips):
+        """
+        Saves the hits of one query (ordered by skip). Cached ranges of the
+        same term that the new range covers are dropped.
+        """
+        starts = array.array('I', starts)
+        skips = array.array('i', skips)
+        self.db.execute(
+            "DELETE FROM queries WHERE corpus = ? AND term = ? AND direction = ? AND lo >= ? AND hi <= ?",
+            (corpus, term, direction, lo, hi))
+        self.db.execute(
+            "INSERT INTO queries (corpus, term, direction, lo, hi, hits, starts, skips, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (corpus, term, direction, lo, hi, len(starts), starts.tobytes(), skips.tobytes(), time.time()))
+
+    def flush(self):
+        """Writes the queued last_used updates, evicts down to the bounds and commits."""
+        if self._touched:
+            self.db.executemany("UPDATE queries SET last_used = ? WHERE id = ?",
+                                [(used, query_id) for query_id, used in self._touched.items()])
+            self._touched = {}
+        self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        queries, hits = self.db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM queries").fetchone()
+        if queries <= self.max_queries and hits <= self.max_hits:
+            return
+        stale = []
+        for query_id, count in self.db.execute("SELECT id, hits FROM queries ORDER BY last_used, id"):
+            if queries <= self.max_queries and hits <= self.max_hits:
+                break
+            stale.append((query_id,))
+            queries -= 1
+            hits -= count
+        self.db.executemany("DELETE FROM queries WHERE id = ?", stale)
+
+    def stats(self):
+        queries, hits = self.db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM queries").fetchone()
+        return {'queries': queries, 'hits': hits}
+
+    def clear(self):
+        self._touched = {}
+        self.db.execute("DELETE FROM queries")
+        self.db.commit()
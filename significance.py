@@ -0,0 +1,218 @@
+import math
+import os
+import random
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, repeat
+from multiprocessing import shared_memory
+from els_index import LetterIndex
+
+NULL_MODELS = ("letters", "words", "markov")
+
+# Null text generator of each ELSSignificance pool worker
+_worker_nulls = None
+
+
+class NullTextGenerator:
+    """
+    Builds seeded control texts with the same length as the original stream.
+
+    - letters: the letters of the text shuffled (keeps letter frequencies)
+    - words:   the words of the text shuffled (keeps words, breaks their order)
+    - markov:  sampled from an order-k letter Markov chain trained on the text
+    """
+    def __init__(self, symbols, word_starts=None, markov_order=2):
+        self.symbols = bytes(symbols)
+        self.word_starts = word_starts
+        self.markov_order = markov_order
+        self._words = None
+        self._markov = None
+
+    def generate(self, model, seed):
+        rng = random.Random(seed)
+        if model == "letters":
+            return self.shuffled_letters(rng)
+        if model == "words":
+            return self.shuffled_words(rng)
+        if model == "markov":
+            return self.markov_text(rng)
+        raise ValueError(f"Unknown null model: {model} (choose from {', '.join(NULL_MODELS)})")
+
+    def shuffled_letters(self, rng):
+        letters = bytearray(self.symbols)
+        rng.shuffle(letters)
+        return bytes(letters)
+
+    def shuffled_words(self, rng):
+        if self.word_starts is None:
+            raise ValueError("The word-shuffle null model needs word start offsets")
+        if self._words is None:
+            ends = list(self.word_starts[1:]) + [len(self.symbols)]
+            self._words = [self.symbols[a:b] for a, b in zip(self.word_starts, ends)]
+        words = list(self._words)
+        rng.shuffle(words)
+        return b"".join(words)
+
+    def _train_markov(self):
+        """Counts next-letter frequencies per context of markov_order letters."""
+        k = self.markov_order
+        alphabet = sorted(set(self.symbols))
+        ids = {s: i for i, s in enumerate(alphabet)}
+        size = len(alphabet) ** k
+        counts = {}
+        ctx = 0
+        for i, s in enumerate(self.symbols):
+            if i >= k:
+                counts.setdefault(ctx, Counter())[s] += 1
+            ctx = (ctx * len(alphabet) + ids[s]) % size if k else 0
+        model = {}
+        for ctx, following in counts.items():
+            letters = sorted(following)
+            model[ctx] = (letters, list(accumulate(following[s] for s in letters)))
+        # Fallback for contexts only seen at the very end of the text
+        totals = Counter(self.symbols)
+        fallback = (alphabet, list(accumulate(totals[s] for s in alphabet)))
+        self._markov = (ids, len(alphabet), size, model, fallback)
+
+    def markov_text(self, rng):
+        if self._markov is None:
+            self._train_markov()
+        ids, base, size, model, fallback = self._markov
+        k = self.markov_order
+        out = bytearray(self.symbols[:k])
+        ctx = 0
+        for s in out:
+            ctx = (ctx * base + ids[s]) % size
+        if not k:
+            ctx = 0
+        rnd = rng.random
+        for _ in range(len(self.symbols) - k):
+            letters, cum = model.get(ctx, fallback)
+            s = letters[bisect_right(cum, rnd() * cum[-1])]
+            out.append(s)
+            if k:
+                ctx = (ctx * base + ids[s]) % size
+        return bytes(out)
+
+
+class ELSSignificance:
+    """
+    Monte Carlo baseline for ELS hit counts.
+
+    The query is run on the real text and on many seeded null texts; the
+    p-value is the share of null texts with at least as many hits
+    ((1 + #null >= observed) / (1 + trials)). Trials are spread over a process
+    pool whose workers read the text from shared memory, and each trial uses
+    its own seed, so results do not depend on the number of workers.
+    """
+    def __init__(self, text, word_starts=None, workers=None, markov_order=2):
+        self.symbols = text.encode('iso8859_8')
+        self.word_starts = word_starts
+        self.workers = workers or os.cpu_count() or 1
+        self.markov_order = markov_order
+
+    def run(self, terms, min_skip=1, max_skip=100, null_model="letters", trials=100, seed=0):
+        """
+        Args:
+            terms (str or list): Term(s) whose hits are counted together.
+            null_model (str): One of NULL_MODELS.
+            trials (int): Number of null texts.
+            seed (int): Trial i uses seed + i.
+
+        Returns:
+            dict: observed count, null counts, mean/stdev, p-value and a
+                  histogram [(hit count, number of null texts)].
+        """
+        if null_model not in NULL_MODELS:
+            raise ValueError(f"Unknown null model: {null_model} (choose from {', '.join(NULL_MODELS)})")
+        if isinstance(terms, str):
+            terms = [terms]
+        encoded = [t.encode('iso8859_8') for t in terms]
+        observed = count_hits(LetterIndex(self.symbols), encoded, min_skip, max_skip)
+
+        seeds = [seed + i for i in range(trials)]
+        if self.workers > 1 and trials > 1:
+            null_counts = self._run_pool(encoded, min_skip, max_skip, null_model, seeds)
+        else:
+            nulls = NullTextGenerator(self.symbols, self.word_starts, self.markov_order)
+            null_counts = _count_trials(encoded, min_skip, max_skip, null_model, seeds, nulls)
+
+        mean = sum(null_counts) / len(null_counts) if null_counts else 0
+        variance = sum((c - mean) ** 2 for c in null_counts) / (len(null_counts) - 1) if len(null_counts) > 1 else 0
+        return {
+            'terms': list(terms),
+            'skips': (min_skip, max_skip),
+            'null_model': null_model,
+            'observed': observed,
+            'trials': trials,
+            'null_counts': null_counts,
+            'mean': mean,
+            'stdev': math.sqrt(variance),
+            'p_value': (1 + sum(1 for c in null_counts if c >= observed)) / (1 + trials),
+            'histogram': sorted(Counter(null_counts).items()),
+        }
+
+    def _run_pool(self, encoded, min_skip, max_skip, null_model, seeds):
+        chunk = max(1, -(-len(seeds) // (self.workers * 4)))
+        chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(self.symbols)))
+        try:
+            shm.buf[:len(self.symbols)] = self.symbols
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(shm.name, len(self.symbols), self.word_starts, self.markov_order)) as pool:
+                parts = pool.map(_count_trials, repeat(encoded), repeat(min_skip), repeat(max_skip),
+                                 repeat(null_model), chunks)
+                return [count for part in parts for count in part]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def format_report(self, result):
+        lines = [
+            f"Terms: {', '.join(result['terms'])}  skips {result['skips'][0]}..{result['skips'][1]}",
+            f"Null model: {result['null_model']} ({result['trials']} texts)",
+            f"Observed hits: {result['observed']}",
+            f"Null hits: mean {result['mean']:.1f}, stdev {result['stdev']:.1f}",
+            f"p-value: {result['p_value']:.4f}",
+        ]
+        return "\n".join(lines)
+
+
+def _init_worker(name, length, word_starts, markov_order):
+    """Pool initializer: attaches the shared text and prepares the null generator."""
+    global _worker_nulls
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        symbols = bytes(shm.buf[:length])
+    finally:
+        shm.close()
+    _worker_nulls = NullTextGenerator(symbols, word_starts, markov_order)
+
+
+def _count_trials(encoded, min_skip, max_skip, null_model, seeds, nulls=None):
+    """Hit counts of the query on the null texts for the given seeds."""
+    nulls = nulls or _worker_nulls
+    return [count_hits(LetterIndex(nulls.generate(null_model, seed)), encoded, min_skip, max_skip)
+            for seed in seeds]
+
+
+def count_hits(index, terms, min_skip, max_skip):
+    """Total hits of the encoded terms over the skip range (skip 0 excluded)."""
+    total = 0
+    for d in range(min_skip, max_skip + 1):
+        if d == 0: continue
+        for term in terms:
+            total += index.count(term, d)
+    return total
+
+
+if __name__ == "__main__":
+    from torah_loader import TorahLoader
+    loader = TorahLoader()
+    flat_text = loader.load_full_torah()
+    test = ELSSignificance(flat_text, loader.citations.word_starts, workers=loader.workers)
+    for model in NULL_MODELS:
+        result = test.run("תורה", 1, 100, null_model=model, trials=100)
+        print(test.format_report(result))
+        print()
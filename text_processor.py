@@ -1,5 +1,26 @@
+import codecs
 import re
 
+# Letter codes used by the compact corpus format: Aleph..Tav map to 0..21 and
+# the five final (sofit) forms carry SOFIT_FLAG on top of their regular code.
+ALPHABET = "אבגדהוזחטיכלמנסעפצקרשת"
+SOFIT_FORMS = {'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ'}
+SOFIT_FLAG = 0x20
+
+# Normalization profiles accepted by TextProcessor.normalize
+PROFILES = {
+    "letters": "Hebrew letters only, sofit forms kept (str)",
+    "folded": "Hebrew letters only, sofit forms folded to their regular form (str)",
+    "words": "Hebrew letters plus a space wherever the source had whitespace or maqaf (str)",
+    "tokens": "Hebrew letters plus a space wherever the source had whitespace; maqaf joins words (str)",
+    "codes": "letter codes 0-21, sofit forms flagged with SOFIT_FLAG (bytes)",
+    "codes_folded": "letter codes 0-21, sofit forms folded (bytes)",
+}
+
+# Byte the maqaf is parked on between the encode and translate passes
+MAQAF_BYTE = 0x80
+
+
 class TextProcessor:
     def __init__(self):
         # Range of Hebrew Unicode characters
@@ -10,6 +31,53 @@ class TextProcessor:
         # We want to remove these for specific analysis modes
         self.cleanup_pattern = re.compile(r'[\u0591-\u05C7]')
 
+        # ISO-8859-8 stores Aleph..Tav (sofit forms included) at 0xE0..0xFA,
+        # which lets us move between letters and codes with bytes.translate.
+        to_code = bytearray(range(256))
+        to_letter = bytearray(range(256))
+        to_regular = {}
+        for char in ALPHABET + "".join(SOFIT_FORMS):
+            code = ALPHABET.index(SOFIT_FORMS.get(char, char))
+            iso = char.encode('iso8859_8')[0]
+            to_regular[iso] = SOFIT_FORMS.get(char, char).encode('iso8859_8')[0]
+            if char in SOFIT_FORMS:
+                code |= SOFIT_FLAG
+            to_code[iso] = code
+            to_letter[code] = iso
+        self.code_table = bytes(to_code)
+        self.letter_table = bytes(to_letter)
+
+        # Front end shared by all profiles: one charmap encode that keeps ASCII,
+        # places the letters at their ISO-8859-8 bytes and maqaf at MAQAF_BYTE,
+        # and drops everything else (niqqud, cantillation, ...) in the same pass.
+        # Byte 0 has to stay NUL, otherwise charmap_build falls back to a slow dict.
+        decoding = [chr(i) for i in range(128)] + ['\ufffe'] * 128
+        decoding[MAQAF_BYTE] = '\u05BE'
+        for iso in to_regular:
+            decoding[iso] = bytes([iso]).decode('iso8859_8')
+        self.front_end = codecs.charmap_build("".join(decoding))
+
+        # Each profile is then a single bytes.translate over the (much shorter) output
+        whitespace = dict.fromkeys(b" \t\n\r\x0b\x0c", 0x20)
+        spaces = {**whitespace, MAQAF_BYTE: 0x20}
+        letters = {iso: iso for iso in to_regular}
+        self.profiles = {
+            "letters": self._compile_profile(letters, True),
+            "folded": self._compile_profile(to_regular, True),
+            "words": self._compile_profile({**letters, **spaces}, True),
+            "tokens": self._compile_profile({**letters, **whitespace}, True),
+            "codes": self._compile_profile({iso: to_code[iso] for iso in to_regular}, False),
+            "codes_folded": self._compile_profile({iso: to_code[iso] & ~SOFIT_FLAG for iso in to_regular}, False),
+        }
+
+    def _compile_profile(self, mapping, as_text):
+        """Builds the (translate table, delete bytes, decode to str) triple for a profile."""
+        table = bytearray(range(256))
+        for src, dst in mapping.items():
+            table[src] = dst
+        delete = bytes(b for b in range(256) if b not in mapping)
+        return bytes(table), delete, as_text
+
     def load_file(self, filepath):
         """Loads Hebrew text from a file."""
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -19,21 +87,36 @@ class TextProcessor:
         """Removes vowels and cantillation marks, keeping only letters."""
         return self.cleanup_pattern.sub('', text)
 
-    def normalize(self, text):
+    def normalize(self, text, profile="letters"):
         """
         Removes all non-Hebrew characters (spaces, punctuation, etc.)
         Returns a continuous string of Hebrew letters.
         Examples: 
             Input: "בְּרֵאשִׁית בָּרָא"
             Output: "בראשיתברא"
+
+        Other profiles (see PROFILES) fold sofit forms, keep word boundaries
+        or return letter codes instead; "words" output is meant for split().
+        Every profile is one charmap encode over the input followed by one
+        bytes.translate, so there is no per-letter allocation.
         """
-        # First, strip niqqud just in case, though the character class below might exclude them if narrowly defined.
-        # But generally we want letters only.
-        
-        # Use findall to get all Hebrew letters and join them
-        letters = self.hebrew_pattern.findall(text)
-        return "".join(letters)
+        table, delete, as_text = self.profiles[profile]
+        out = codecs.charmap_encode(text, 'ignore', self.front_end)[0].translate(table, delete)
+        return out.decode('iso8859_8') if as_text else out
 
     def flatten_text(self, text):
         """Alias for normalize in the context of ELS which needs a flat string."""
         return self.normalize(text)
+
+    def encode_letters(self, text):
+        """
+        Normalizes text and returns it as letter codes, one byte per letter.
+        Example:
+            Input: "שָׁלוֹם"
+            Output: b'\\x14\\x0b\\x05\\x2c'  (Shin, Lamed, Vav, Mem | SOFIT_FLAG)
+        """
+        return self.normalize(text, "codes")
+
+    def decode_letters(self, codes):
+        """Turns a buffer of letter codes back into a string of Hebrew letters."""
+        return bytes(codes).translate(self.letter_table).decode('iso8859_8')
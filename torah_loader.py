@@ -1,10 +1,19 @@
+import array
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from text_processor import TextProcessor
+from corpus_cache import CorpusCache
+from citation_index import CitationIndex
+from letter_stream import LetterStream, derive_stream
 
 class TorahLoader:
-    def __init__(self):
+    def __init__(self, workers=None):
         self.tp = TextProcessor()
+        self.cache = CorpusCache()
+        self.citations = None
+        # Books are parsed in a process pool; workers=1 keeps it in-process
+        self.workers = workers or os.cpu_count() or 1
         # Canonical Order of the Tanakh
         self.books = [
             # Torah
@@ -22,36 +31,155 @@ class TorahLoader:
         ]
     
     def load_full_torah(self):
-        full_text = []
+        codes = self.load_corpus()
+        normalized = self.tp.decode_letters(codes)
+        print(f"Normalized Stream: {len(normalized)} Hebrew letters")
+        return normalized
+
+    def load_corpus(self, use_cache=True):
+        """
+        Returns the normalized corpus as letter codes (see text_processor.ALPHABET).
+
+        The codes are memory-mapped from the corpus cache when it matches the
+        current source files; otherwise the JSON is parsed and the cache rebuilt.
+        Either way self.citations holds the matching CitationIndex afterwards.
+        """
+        if use_cache:
+            codes = self.cache.load(self.books)
+            verses = self.cache.load_array('verses')
+            words = self.cache.load_array('words')
+            if codes is not None and verses is not None and words is not None:
+                self.citations = CitationIndex.from_arrays(self.book_names(), len(codes), verses, words)
+                print(f"Loaded cached corpus: {len(codes)} letters")
+                return codes
+
+        codes, self.citations = self.build_corpus()
+        if use_cache:
+            self.cache.save(codes, self.books, self.citations.to_arrays())
+        return memoryview(codes)
+
+    def load_stream(self, name="letters", use_cache=True):
+        """
+        Returns a LetterStream (see letter_stream.STREAMS), e.g. the first
+        letter of every word, with a back map to offsets in the main stream.
+
+        Derived streams are cut out of the cached corpus codes, never from the
+        JSON, and are cached next to it on first use.
+        """
+        codes = self.load_corpus(use_cache)
+        if name == "letters":
+            return LetterStream(self.tp.decode_letters(codes))
+        stream_codes = back_map = None
+        if use_cache:
+            stream_codes = self.cache.load_array(f"{name}.codes")
+            back_map = self.cache.load_array(f"{name}.map")
+        if stream_codes is None or back_map is None:
+            stream_codes, back_map = derive_stream(name, codes, self.citations)
+            if use_cache:
+                self.cache.save_arrays({f"{name}.codes": array.array('B', stream_codes), f"{name}.map": back_map})
+        return LetterStream(self.tp.decode_letters(stream_codes), name, back_map)
+
+    def load_citations(self):
+        """Returns the CitationIndex for the corpus, loading it if needed."""
+        if self.citations is None:
+            self.load_corpus()
+        return self.citations
+
+    def book_names(self):
+        # "data/i_samuel.json" -> "i_samuel"
+        return [os.path.splitext(os.path.basename(path))[0] for path in self.books]
+
+    def build_corpus(self):
+        """
+        Parses the JSON books, one book per worker process, and appends each
+        book to a single buffer as soon as its result comes in, in canonical
+        self.books order. Only the books not yet placed are held besides the
+        buffer, so peak memory stays close to the final corpus size.
+
+        Returns:
+            tuple: (letter codes as bytearray, CitationIndex with verse and word offsets)
+        """
         print("Loading full Torah corpus...")
-        
-        for book_path in self.books:
+        tasks = []
+        for book_id, book_path in enumerate(self.books):
             if not os.path.exists(book_path):
                 print(f"Warning: {book_path} not found. Skipping.")
                 continue
-                
-            try:
-                with open(book_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Sefaria JSON structure usually: { "text": [ ["Chapter 1 vs 1", "vs 2"], ["Chap 2"] ] }
-                    # or slightly different depending on export.
-                    # Let's inspect structure blindly or safe process
-                    
-                    text_content = data.get('text', [])
-                    for chapter in text_content:
-                        if isinstance(chapter, list):
-                            for verse in chapter:
-                                if isinstance(verse, str):
-                                    full_text.append(verse)
-            except Exception as e:
-                print(f"Error loading {book_path}: {e}")
-
-        combined = " ".join(full_text)
-        print(f"Raw Text Loaded: {len(combined)} chars")
-        
-        normalized = self.tp.normalize(combined)
-        print(f"Normalized Stream: {len(normalized)} Hebrew letters")
-        return normalized
+            tasks.append((book_id, book_path))
+
+        codes = bytearray()
+        citations = CitationIndex(self.book_names())
+        raw_chars = 0
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                # map() yields in submission order, i.e. canonical book order
+                for part in pool.map(ingest_book, tasks):
+                    raw_chars += self._place_book(codes, citations, part)
+        else:
+            for task in tasks:
+                raw_chars += self._place_book(codes, citations, ingest_book(task))
+        citations.length = len(codes)
+
+        print(f"Raw Text Loaded: {max(raw_chars - 1, 0)} chars")
+        return codes, citations
+
+    def _place_book(self, codes, citations, part):
+        """Appends one ingest_book result to the corpus; returns its raw character count."""
+        book_id, book_codes, verses, words, book_chars, error = part
+        if error:
+            print(f"Error loading {self.books[book_id]}: {error}")
+        offset = len(codes)
+        codes += book_codes
+        for j in range(0, len(verses), 3):
+            citations.add_verse(book_id, verses[j], verses[j + 1], offset + verses[j + 2])
+        citations.word_starts.extend(map(offset.__add__, words))
+        return book_chars
+
+
+def iter_verses(book_path):
+    """Yields (chapter, verse, text) for every verse of a Sefaria JSON book."""
+    with open(book_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Sefaria JSON structure usually: { "text": [ ["Chapter 1 vs 1", "vs 2"], ["Chap 2"] ] }
+    # or slightly different depending on export.
+    # Let's inspect structure blindly or safe process
+    text_content = data.get('text', [])
+    for chapter_no, chapter in enumerate(text_content, 1):
+        if isinstance(chapter, list):
+            for verse_no, verse in enumerate(chapter, 1):
+                if isinstance(verse, str):
+                    yield chapter_no, verse_no, verse
+
+
+def ingest_book(task):
+    """
+    Worker for TorahLoader.build_corpus: normalizes one book verse by verse.
+
+    Returns:
+        tuple: (book_id, codes, verse rows as (chapter, verse, offset) triples,
+                word start offsets, raw character count, error message or None)
+        Offsets are relative to the start of the book.
+    """
+    book_id, book_path = task
+    tp = TextProcessor()
+    codes = bytearray()
+    verses = array.array('I')
+    words = array.array('I')
+    raw_chars = 0
+    error = None
+    try:
+        for chapter_no, verse_no, verse in iter_verses(book_path):
+            raw_chars += len(verse) + 1
+            verses.extend((chapter_no, verse_no, len(codes)))
+            # The "words" profile keeps whitespace/maqaf as word boundaries
+            start = len(codes)
+            for word in tp.normalize(verse, "words").split():
+                words.append(start)
+                start += len(word)
+            codes += tp.normalize(verse, "codes")
+    except Exception as e:
+        error = str(e)
+    return book_id, bytes(codes), verses, words, raw_chars, error
 
 if __name__ == "__main__":
     loader = TorahLoader()
@@ -1,9 +1,30 @@
+import os
 import sys
+import tempfile
+import json
+import math
+import random
 import unittest
+from collections import Counter
 from text_processor import TextProcessor
 from gematria import GematriaEngine
 from els_search import BibleCodeScanner
 from ciphers import CipherEngine
+from corpus_cache import CorpusCache
+from citation_index import CitationIndex
+from torah_loader import TorahLoader
+from significance import ELSSignificance, NullTextGenerator
+from proximity import ProximityJoin
+from els_table import ELSTable
+from result_cache import ELSResultCache
+from kgram_index import StridedKGramIndex
+from els_pattern import ELSPattern
+from gematria_index import GematriaIndex
+from gematria_lookup import GematriaLookup
+from number_stats import NumberStats, PrimeSieve, property_table, group_starts, PROPERTIES
+from cipher_solver import NGramModel, CipherSolver, fold_codes
+from entropy_lab import EntropyLab
+from entropy_profile import EntropyProfile
 
 class TestTorahWorkbench(unittest.TestCase):
     def setUp(self):
@@ -19,6 +40,15 @@ class TestTorahWorkbench(unittest.TestCase):
         self.assertEqual(self.tp.normalize(raw), expected)
         print("Text Normalization: PASS")
 
+    def test_normalization_profiles(self):
+        raw = "וְחֹשֶׁךְ עַל־פְּנֵי תְהוֹם׃"
+        self.assertEqual(self.tp.normalize(raw, "letters"), "וחשךעלפניתהום")
+        self.assertEqual(self.tp.normalize(raw, "folded"), "וחשכעלפניתהומ")
+        self.assertEqual(self.tp.normalize(raw, "words").split(), ["וחשך", "על", "פני", "תהום"])
+        self.assertEqual(self.tp.normalize(raw, "codes"), self.tp.encode_letters(raw))
+        self.assertEqual(self.tp.decode_letters(self.tp.normalize(raw, "codes_folded")), "וחשכעלפניתהומ")
+        print("Normalization Profiles: PASS")
+
     def test_gematria(self):
         # 'שלום' - Shin(300) + Lamed(30) + Vav(6) + Mem Sophit(40) = 376
         # Note: Mem Sophit in my engine is mapped to 40 same as Mem.
@@ -62,6 +92,500 @@ class TestTorahWorkbench(unittest.TestCase):
         self.assertTrue(found)
         print("ELS Search: PASS")
 
+    def test_els_letter_index(self):
+        text = "גבאמאבגמבא"
+        brute = []
+        for d in list(range(-4, 0)) + list(range(1, 5)):
+            for n in range(len(text)):
+                idx = [n + k * d for k in range(3)]
+                if all(0 <= i < len(text) for i in idx) and "".join(text[i] for i in idx) == "אבג":
+                    brute.append((n, d))
+        hits = list(self.els.search(text, "אבג", -4, 4))
+        self.assertEqual([(h['start_index'], h['skip']) for h in hits], brute)
+        # Backward hit ending on the very first letter
+        self.assertIn((2, -1), brute)
+        print("ELS Letter Index: PASS")
+
+    def test_els_search_many(self):
+        text = "אבגדאבגבאגדא" * 3
+        terms = ["אב", "אבג", "גד", "דא", "אבג"]
+        expected = []
+        for d in range(-3, 4):
+            if d == 0:
+                continue
+            row = [(h['start_index'], ["אב", "אבג", "גד", "דא"].index(t), t)
+                   for t in ["אב", "אבג", "גד", "דא"] for h in self.els.search(text, t, d, d)]
+            expected += [(t, n, d) for n, _, t in sorted(row)]
+        got = [(h['term'], h['start_index'], h['skip']) for h in self.els.search_many(text, terms, -3, 3)]
+        self.assertEqual(got, expected)
+        print("ELS Multi-term Scan: PASS")
+
+    def test_els_parallel(self):
+        text = "אבגדאבגבאגדא" * 20
+        terms = ["אב", "גד", "דאב"]
+        serial = list(self.els.search_many(text, terms, -15, 15))
+        parallel = list(self.els.search_parallel(text, terms, -15, 15, workers=2))
+        self.assertEqual(parallel, serial)
+        print("ELS Parallel Scan: PASS")
+
+    def test_els_full_range(self):
+        text = "בגאדבאגדגבאדאגבדאבג" * 2
+        brute = []
+        for d in range(-len(text), len(text) + 1):
+            for n in range(len(text)):
+                idx = [n + k * d for k in range(3)]
+                if d and all(0 <= i < len(text) for i in idx) and "".join(text[i] for i in idx) == "אגד":
+                    brute.append((n, d))
+        hits = list(self.els.search_full_range(text, "אגד"))
+        self.assertEqual([(h['start_index'], h['skip']) for h in hits], brute)
+        self.assertTrue(any(abs(d) > 10 for n, d in brute))
+        print("ELS Full-range Search: PASS")
+
+    def test_significance(self):
+        text = "בראשיתבראאלהיםאתהשמיםואתהארץ" * 4
+        words = list(range(0, len(text), 4))
+        nulls = NullTextGenerator(text.encode('iso8859_8'), words)
+        for model in ("letters", "words", "markov"):
+            null_text = nulls.generate(model, 7)
+            if model != "markov":
+                self.assertEqual(sorted(null_text), sorted(text.encode('iso8859_8')))
+            self.assertEqual(len(null_text), len(text))
+            self.assertEqual(null_text, nulls.generate(model, 7))
+
+        test = ELSSignificance(text, words, workers=1)
+        result = test.run("אתה", 1, 5, null_model="letters", trials=20, seed=3)
+        self.assertEqual(result['observed'], len(list(self.els.search(text, "אתה", 1, 5))))
+        self.assertEqual(sum(n for _, n in result['histogram']), 20)
+        # Seeds are per trial, so a pool gives the same null counts
+        pooled = ELSSignificance(text, words, workers=2).run("אתה", 1, 5, null_model="letters", trials=20, seed=3)
+        self.assertEqual(pooled['null_counts'], result['null_counts'])
+        self.assertTrue(0 < result['p_value'] <= 1)
+        print("ELS Significance: PASS")
+
+    def test_proximity_join(self):
+        groups = [[40, 3, 95, 57], [60, 11, 0, 90, 44], [52, 7, 99]]
+        for width in (None, 10):
+            join = ProximityJoin(width)
+            brute = [(i, j, join.distance(a, b)) for i, a in enumerate(groups[0])
+                     for j, b in enumerate(groups[1]) if join.distance(a, b) <= 8]
+            self.assertEqual(join.pairs(groups[0], groups[1], 8), brute)
+            brute = [(i, j, k) for i, a in enumerate(groups[0]) for j, b in enumerate(groups[1])
+                     for k, c in enumerate(groups[2])
+                     if max(join.distance(a, b), join.distance(a, c), join.distance(b, c)) <= 8]
+            self.assertEqual(join.clusters(groups, 8), brute)
+        # 3 and 11 are 8 letters apart, but 3 rows apart in a table of width 3
+        self.assertIn((1, 1), [(i, j) for i, j, _ in ProximityJoin().pairs(groups[0], groups[1], 8)])
+        self.assertNotIn((1, 1), [(i, j) for i, j, _ in ProximityJoin(3).pairs(groups[0], groups[1], 2)])
+        print("Proximity Join: PASS")
+
+    def test_els_table(self):
+        text = "אבגדהוזחטיכלמנסעפצקרשת" * 3
+        hits = [{'term': "אהט", 'start_index': 0, 'skip': 4},
+                {'term': "בו", 'start_index': 1, 'skip': 4}]
+        table = ELSTable(text)
+        # Width 4 stacks both terms in two neighbouring columns
+        self.assertEqual(table.best_widths(hits, 2, 30, top=1), [(4, 6)])
+        self.assertEqual(table.compactness(hits, [4, 8], "distance"), [1.0, 1.0])
+        # Columns 3, 4, 0, 1 are adjacent once the rows wrap around
+        self.assertEqual(table.compactness(hits, [5]), [10])
+        self.assertEqual(ELSTable(text, cylinder=True).compactness(hits, [5]), [8])
+        lines = table.render(hits, 4, margin=0)
+        self.assertEqual(len(lines), 3)
+        self.assertIn("[א][ב]", lines[0])
+        print("ELS Table: PASS")
+
+    def test_result_cache(self):
+        text = "בגאדבאגדגבאדאגבדאבג" * 3
+        terms = ["אגד", "בג"]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ELSResultCache(os.path.join(tmp, "els.sqlite"), max_queries=3)
+            scanner = BibleCodeScanner(result_cache=cache)
+            expected = list(self.els.search_many(text, terms, -8, 8))
+            self.assertEqual(list(scanner.search_many(text, terms, -8, 8)), expected)
+            self.assertEqual(cache.stats()['queries'], 3)  # LRU limit: one of the 4 entries evicted
+            self.assertEqual(list(scanner.search_many(text, terms, -8, 8)), expected)
+            # Sub-ranges come from the cached super-range
+            corpus = cache.corpus_digest(text)
+            self.assertIsNotNone(cache.lookup(corpus, "אגד", 1, 2, 5))
+            self.assertIsNone(cache.lookup(corpus, "אגד", 1, 2, 9))
+            self.assertEqual(len(cache._touched), 1)  # last_used waits for flush()
+            cache.flush()
+            self.assertEqual(cache._touched, {})
+            self.assertEqual(list(scanner.search(text, "אגד", 2, 5)), list(self.els.search(text, "אגד", 2, 5)))
+            cache.close()
+        print("ELS Result Cache: PASS")
+
+    def test_kgram_index(self):
+        text = "בגאדבאגדגבאדאגבדאבגדדא" * 4
+        with tempfile.TemporaryDirectory() as tmp:
+            index = StridedKGramIndex(tmp, "test", k=3, max_skip=6)
+            built = index.build(text, workers=1)
+            self.assertGreater(built['bytes'], 0)
+            loaded = StridedKGramIndex(tmp, "test", k=3, max_skip=6)
+            self.assertTrue(loaded.load(text))
+            self.assertFalse(StridedKGramIndex(tmp, "test", k=3, max_skip=6).load(text[1:]))
+            # Short terms and skips past max_skip fall back to the bitset search
+            for term in ("אגד", "דאבג", "בג", "אגדגב"):
+                self.assertEqual(list(loaded.search(term, -9, 9)), list(self.els.search(text, term, -9, 9)))
+        print("Strided K-gram Index: PASS")
+
+    def test_els_pattern(self):
+        dfa = ELSPattern(["ד(ו)ד", "[הח]?ם", "שלום"])
+        self.assertEqual(dfa.match("דוד"), [0])
+        self.assertEqual(dfa.match("דד"), [0])
+        self.assertEqual(dfa.match("חאמ"), [1])  # sofit folded
+        self.assertEqual(dfa.match("שלם"), [])
+        self.assertEqual(ELSPattern("[^א]ב").match("אב"), [])
+        with self.assertRaises(ValueError):
+            ELSPattern("(א)")
+
+        text = "דמוכדלדתדונדמחאםד" * 3
+        hits = list(self.els.search_pattern(text, "ד(ו)ד", -6, 6))
+        # Same hits as searching every spelling separately
+        expected = sorted([(h['skip'], h['start_index'], len(h['term']), h['term'])
+                           for term in ("דוד", "דד") for h in self.els.search(text, term, -6, 6)])
+        self.assertEqual([(h['skip'], h['start_index'], len(h['term']), h['term']) for h in hits], expected)
+        self.assertTrue(all(h['pattern'] == "ד(ו)ד" for h in hits))
+        print("ELS Pattern Search: PASS")
+
+    def test_els_approximate(self):
+        text = "אבגדאבגהאבזדגבגד" * 3
+        hits = list(self.els.search_approximate(text, "אבגד", 1, -5, 5))
+        brute = []
+        for d in range(-5, 6):
+            for n in range(len(text)):
+                idx = [n + k * d for k in range(4)]
+                if d and all(0 <= i < len(text) for i in idx):
+                    mismatches = sum(text[i] != c for i, c in zip(idx, "אבגד"))
+                    if mismatches <= 1:
+                        brute.append((n, d, mismatches))
+        brute.sort(key=lambda hit: (hit[1], hit[0]))
+        self.assertEqual([(h['start_index'], h['skip'], h['mismatches']) for h in hits], brute)
+        self.assertIn("אבגה", [h['found'] for h in hits])
+        exact = [(h['start_index'], h['skip']) for h in hits if h['mismatches'] == 0]
+        self.assertEqual(exact, [(h['start_index'], h['skip']) for h in self.els.search(text, "אבגד", -5, 5)])
+        print("ELS Approximate Search: PASS")
+
+    def test_corpus_cache(self):
+        codes = self.tp.encode_letters("שָׁלוֹם עַל־פְּנֵי")
+        self.assertEqual(self.tp.decode_letters(codes), "שלוםעלפני")
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "book.json")
+            with open(source, "w", encoding="utf-8") as f:
+                f.write("{}")
+            cache = CorpusCache(os.path.join(tmp, "cache"))
+            self.assertIsNone(cache.load([source]))
+            cache.save(codes, [source])
+            self.assertEqual(bytes(cache.load([source])), codes)
+            # Touching a source invalidates the cache
+            with open(source, "w", encoding="utf-8") as f:
+                f.write('{"text": []}')
+            self.assertIsNone(cache.load([source]))
+        print("Corpus Cache: PASS")
+
+    def test_citation_index(self):
+        index = CitationIndex(["genesis", "i_samuel"], length=30)
+        index.add_verse(0, 1, 1, 0)
+        index.add_verse(0, 1, 2, 10)
+        index.add_verse(0, 2, 1, 15)
+        index.add_verse(1, 1, 1, 22)
+        self.assertEqual(index.cite(12), ("Genesis", 1, 2))
+        self.assertEqual(index.cite_many([0, 29, 15]), [("Genesis", 1, 1), ("I Samuel", 1, 1), ("Genesis", 2, 1)])
+        self.assertEqual(index.bounds("genesis", 2, 2), (15, 22))
+        self.assertEqual(index.bounds("I Samuel"), (22, 30))
+
+        # Only the span is searched, offsets stay global
+        text = "אמבמג" * 6
+        hits = list(self.els.search_span(text, "אבג", (15, 22), 2, 2))
+        self.assertEqual([h['start_index'] for h in hits], [15])
+        print("Citation Index: PASS")
+
+    def test_parallel_ingestion(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            books = []
+            for name, chapters in (("alpha", [["אב גד", "הו"]]), ("beta", [["זח"], ["טי־כל"]])):
+                path = os.path.join(tmp, name + ".json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"text": chapters}, f)
+                books.append(path)
+            loader = TorahLoader(workers=2)
+            loader.books = books
+            codes, citations = loader.build_corpus()
+            self.assertEqual(self.tp.decode_letters(codes), "אבגדהוזחטיכל")
+            self.assertEqual(list(citations.word_starts), [0, 2, 4, 6, 8, 10])
+            self.assertEqual(citations.cite(9), ("Beta", 2, 1))
+        print("Parallel Ingestion: PASS")
+
+    def test_derived_streams(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "alpha.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"text": [["בראשית ברא", ""], ["אלהים את־השמים"]]}, f)
+            loader = TorahLoader(workers=1)
+            loader.books = [path]
+            loader.cache = CorpusCache(os.path.join(tmp, "cache"))
+            initials = loader.load_stream("word_initials")
+            self.assertEqual(initials, "בבאאה")
+            self.assertEqual(loader.load_stream("word_finals"), "תאםתם")
+            verses = loader.load_stream("verse_initials")
+            self.assertEqual(verses, "בא")
+            self.assertEqual(verses.corpus_offsets([0, 1]), [0, 9])
+            backwards = loader.load_stream("reversed")
+            self.assertEqual(backwards, "םימשהתאםיהלאארבתישארב")
+            self.assertEqual(backwards.corpus_offset(0), 20)
+            # Second load comes from the cache, not from the JSON
+            cached = TorahLoader(workers=1)
+            cached.books, cached.cache = loader.books, loader.cache
+            cached.build_corpus = None
+            self.assertEqual(list(cached.load_stream("word_initials").back_map), [0, 6, 9, 14, 16])
+            hits = initials.annotate(self.els.search(initials, "בא", 1, 1))
+            self.assertEqual([h['corpus_index'] for h in hits], [6])
+            self.assertEqual(self.ge.calculate(initials), 2 + 2 + 1 + 1 + 5)
+        print("Derived Streams: PASS")
+
+    def test_gematria_index(self):
+        words = self.tp.normalize("בְּרֵאשִׁית בָּרָא אֱלֹהִים אֵת־הַשָּׁמַיִם", "tokens").split()
+        self.assertEqual(words, ["בראשית", "ברא", "אלהים", "אתהשמים"])
+        index = GematriaIndex.from_words(words)
+        for method in ("standard", "ordinal", "reduced"):
+            self.assertEqual(list(index.word_values(method)), [self.ge.calculate(w, method) for w in words])
+        self.assertEqual(index.word_value(0), 913)
+        self.assertEqual(index.span(0, index.length), sum(self.ge.calculate(w) for w in words))
+        self.assertEqual(index.spans([0, 6], [6, 9]), [913, 203])
+        self.assertEqual(index.words(), words)
+        print("Gematria Index: PASS")
+
+    def test_gematria_lookup(self):
+        words = ["שלום", "עשו", "בקר", "יום", "שלום", "אב", "בא"]
+        index = GematriaIndex.from_words(words)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CorpusCache(tmp)
+            cache.save(b"", [])
+            lookup = GematriaLookup(index.text, index.word_starts, cache, max_phrase_words=3)
+            self.assertEqual(lookup.lookup(376), [0, 1, 4])
+            self.assertEqual(lookup.words(376), [("שלום", 2), ("עשו", 1)])
+            brute = [(i, m) for m in range(2, 4) for i in range(len(words) - m + 1)
+                     if sum(self.ge.calculate(w) for w in words[i:i + m]) == 358]
+            self.assertEqual(lookup.phrases(358), sorted(brute))
+            self.assertEqual(lookup.phrase_text(2, 2), "בקר יום")
+            # Longer phrases than the window table are scanned from the totals
+            self.assertEqual(lookup.phrases(376 + 302 + 56), [(1, 3), (2, 3)])
+            self.assertEqual(lookup.phrases(376 + 376 + 302 + 56), [])
+            self.assertEqual(lookup.phrases(376 + 376 + 302 + 56, max_words=5), [(0, 4), (1, 4)])
+            # A second instance reads the saved tables
+            reloaded = GematriaLookup(index.text, index.word_starts, cache, max_phrase_words=3)
+            self.assertEqual(reloaded.phrases(358), lookup.phrases(358))
+            # Another text sharing the cache gets its own tables
+            other = GematriaIndex.from_words(["אב", "גד"])
+            second = GematriaLookup(other.text, other.word_starts, cache, max_phrase_words=3)
+            self.assertEqual(second.lookup(376), [])
+            self.assertEqual(second.lookup(3), [0])
+            self.assertEqual(second.words(7), [("גד", 1)])
+            self.assertEqual(second.phrases(10), [(0, 2)])
+            self.assertEqual(GematriaLookup(index.text, index.word_starts, cache).lookup(376), [0, 1, 4])
+        # Words worth 0 make equal totals; every run is still found
+        engine = GematriaEngine()
+        engine.register("ab", {"א": 1, "ב": 2})
+        zeros = GematriaLookup(index.text, index.word_starts, methods=("ab",), max_phrase_words=2, engine=engine)
+        values = [engine.calculate(w, "ab") for w in words]
+        for target in (2, 3, 5):
+            brute = [(i, m) for m in range(2, 7) for i in range(len(words) - m + 1) if sum(values[i:i + m]) == target]
+            self.assertEqual(zeros.phrases(target, "ab", max_words=6), sorted(brute))
+        print("Gematria Lookup: PASS")
+
+    def test_gematria_methods(self):
+        self.assertEqual(self.ge.calculate("שלום", "gadol"), 300 + 30 + 6 + 600)
+        self.assertEqual(self.ge.calculate("שלום עליכם", "kolel"), self.ge.calculate("שלום עליכם") + 2)
+        self.assertEqual(self.ge.calculate("אב", "atbash"), 400 + 300)
+        self.assertEqual(self.ge.calculate("ך", "atbash"), self.ge.calculate("ל"))
+        self.assertEqual(self.ge.calculate("אבג", "hakadmi"), 1 + 3 + 6)
+        self.assertEqual(self.ge.calculate("ת", "hakadmi"), 1495)
+        with self.assertRaises(ValueError):
+            self.ge.calculate("אב", "unknown")
+
+        texts = ["בְּרֵאשִׁית בָּרָא", "אמת", ""]
+        batch = self.ge.calculate_many(texts)
+        for text, row in zip(texts, batch):
+            self.assertEqual(row, {method: self.ge.calculate(text, method) for method in self.ge.methods})
+        self.ge.register("tens", {"א": 10})
+        self.assertEqual(self.ge.calculate_many(["אאב"], ["tens", "standard"]), [{"tens": 20, "standard": 4}])
+        index = GematriaIndex.from_words(["שלום", "עליכם"], methods=())
+        self.assertEqual(list(index.word_values("kolel")), [377, 171])
+        print("Gematria Methods: PASS")
+
+    def test_number_stats(self):
+        sieve = PrimeSieve(100)
+        self.assertEqual(sieve.primes()[:10], [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])
+        self.assertEqual(len(sieve.primes()), 25)
+        self.assertTrue(sieve.is_prime(97))
+        self.assertFalse(sieve.is_prime(91))
+        with self.assertRaises(ValueError):
+            sieve.is_prime(101)
+        table, _ = property_table(30)
+        bits = {name: 1 << i for i, name in enumerate(PROPERTIES)}
+        self.assertEqual(table[21], bits["triangular"] | bits["fibonacci"] | bits["multiple_of_7"])
+        self.assertEqual(table[3], bits["prime"] | bits["triangular"] | bits["fibonacci"])
+
+        # Two "books": values 913 203 86 | 401 7 (401 and 7 are prime, 203 = 7 * 29)
+        words = ["בראשית", "ברא", "אלהים", "את", "ז"]
+        index = GematriaIndex.from_words(words)
+        stats = NumberStats(index.text, index.word_starts, [("A", 0), ("B", 3)])
+        self.assertEqual(list(stats.values), [913, 203, 86, 401, 7])
+        result = stats.run(trials=5, seed=1)
+        self.assertEqual(result['words'], [3, 2])
+        self.assertEqual(result['observed']['prime'], [0, 2])
+        self.assertEqual(result['observed']['multiple_of_7'], [1, 1])
+        self.assertEqual(result['observed']['square'], [0, 0])
+        self.assertEqual(result, stats.run(trials=5, seed=1))
+        # The word-shuffle null keeps every word value, so its totals match exactly
+        words_null = stats.run("words", trials=5)['null']['prime']
+        self.assertEqual((words_null['mean'], words_null['stdev']), (2, 0))
+        self.assertIn("B", stats.format_report(result))
+
+        citations = CitationIndex(["genesis", "exodus"], 20)
+        for book, chapter, offset in ((0, 1, 0), (0, 1, 5), (0, 2, 8), (1, 1, 14)):
+            citations.add_verse(book, chapter, 1, offset)
+        for offset in (0, 3, 5, 8, 11, 14, 17):
+            citations.add_word(offset)
+        self.assertEqual(group_starts(citations), [("Genesis", 0), ("Exodus", 5)])
+        self.assertEqual(group_starts(citations, "chapter"), [("Genesis 1", 0), ("Genesis 2", 3), ("Exodus 1", 5)])
+        print("Number Stats: PASS")
+
+    def test_cipher_family(self):
+        self.assertEqual(self.ce.atbash("בראשית"), "שגתבמא")
+        self.assertEqual(self.ce.albam("אב"), "למ")
+        self.assertEqual(self.ce.encipher("אבהקר", "atbah"), "טחנתש")
+        self.assertEqual(self.ce.encipher("אבת", "avgad"), "בגא")
+        self.assertEqual(self.ce.encipher("אב", "shift3"), "דה")
+        # Sofit forms are enciphered as their regular letter; other characters pass through
+        self.assertEqual(self.ce.atbash("שלום!"), "בכפי!")
+        for name in self.ce.ciphers:
+            self.assertEqual(self.ce.decipher(self.ce.encipher("בראשית", name), name), "בראשית")
+        self.assertEqual(self.ce.encipher("שלום", "shift0"), "שלומ")
+        self.ce.register("swap", {"א": "ב", "ב": "א"})
+        self.assertEqual(self.ce.encipher("אבג", "swap"), "באג")
+        with self.assertRaises(ValueError):
+            self.ce.register("broken", {"א": "ב"})
+        with self.assertRaises(ValueError):
+            self.ce.encipher("אב", "unknown")
+
+        codes = self.tp.encode_letters("שלום")
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CorpusCache(tmp)
+            cache.save(codes, [])
+            streams = self.ce.transform_corpus(codes, ["atbash", "avgad"], cache)
+            self.assertEqual(self.tp.decode_letters(streams["atbash"]), "בכפי")
+            self.assertEqual(self.tp.decode_letters(streams["avgad"]), self.ce.encipher("שלום", "avgad"))
+            self.assertIsNotNone(cache.load_array(self.ce.cache_key("atbash", self.ce.corpus_digest(codes))))
+            self.assertEqual(self.ce.transform_corpus(codes, ["atbash"], cache), {"atbash": streams["atbash"]})
+            # Another text of the same length does not get the cached stream
+            other = self.tp.encode_letters("אבגד")
+            self.assertEqual(self.tp.decode_letters(self.ce.transform_corpus(other, ["atbash"], cache)["atbash"]), "תשרק")
+            # and replaces it: the streams of the first text are pruned with their files
+            self.assertEqual(cache.array_keys("cipher."), [self.ce.cache_key("atbash", self.ce.corpus_digest(other))])
+            self.assertFalse(os.path.exists(cache.array_path(self.ce.cache_key("avgad", self.ce.corpus_digest(codes)))))
+        print("Cipher Family: PASS")
+
+    def test_cipher_els(self):
+        rng = random.Random(7)
+        text = "".join(rng.choice("אבגדהוזחטיכלמנסעפצקרשתםן") for _ in range(400))
+        # Plant the Atbash image of תורה (אפגצ) at skip 5
+        text = text[:40] + "".join(c + text[41 + 5 * i:45 + 5 * i] for i, c in enumerate("אפגצ")) + text[60:]
+        ciphers = ["atbash", "albam", "atbah", "avgad", "shift0"]
+        hits = list(self.els.search_ciphers(text, ["תורה", "שלום"], ciphers, 1, 20))
+        self.assertIn({'term': "תורה", 'cipher': "atbash", 'found': "אפגצ", 'start_index': 40, 'skip': 5}, hits)
+        # Same hits as enciphering the text under each cipher and scanning it
+        expected = set()
+        for cipher in ciphers:
+            enciphered = self.ce.encipher(text, cipher)
+            for term in ("תורה", "שלום"):
+                folded = self.ce.encipher(term, "shift0")
+                expected |= {(term, cipher, h['start_index'], h['skip'])
+                             for h in BibleCodeScanner().search(enciphered, folded, 1, 20)}
+        self.assertEqual({(h['term'], h['cipher'], h['start_index'], h['skip']) for h in hits}, expected)
+        self.assertEqual(hits, sorted(hits, key=lambda h: (h['skip'], h['start_index'])))
+        # Terms are letters, not patterns: ? passes every cipher unchanged and would be a wildcard
+        with self.assertRaises(ValueError):
+            list(self.els.search_ciphers(text, ["ת?רה"], ciphers, 1, 20))
+        print("Cipher ELS: PASS")
+
+    def test_cipher_solver(self):
+        plain = self.tp.normalize(
+            "בראשית ברא אלהים את השמים ואת הארץ והארץ היתה תהו ובהו וחשך על פני תהום "
+            "ורוח אלהים מרחפת על פני המים ויאמר אלהים יהי אור ויהי אור וירא אלהים את האור כי טוב")
+        model = NGramModel.train(self.tp.encode_letters(plain) * 3, n=2)
+        self.assertEqual(len(model.logprob), 22 ** 2)
+        solver = CipherSolver(model, workers=1)
+        alphabet = "אבגדהוזחטיכלמנסעפצקרשת"
+        key = solver.engine.decipher(alphabet, "shift0")
+        folded = fold_codes(self.tp.encode_letters(plain))
+        self.assertAlmostEqual(solver.score(plain, key), model.score(folded))
+        # The key of a cipher is its inverse image of the alphabet
+        passage = self.ce.encipher(plain, "shift5")
+        scores = solver.score_keys(passage, [c[2] for c in solver.fixed_candidates()])
+        key_shift5 = solver.engine.decipher(alphabet, "shift5")
+        self.assertEqual(scores[5], solver.score(passage, key_shift5))
+        best = solver.solve(passage, restarts=2, iterations=200)
+        self.assertEqual((best[0]['name'], best[0]['key']), ("shift 5", key_shift5))
+        self.assertEqual(best[0]['text'], self.ce.encipher(plain, "shift0"))
+        self.assertEqual(best, CipherSolver(model, workers=2).solve(passage, restarts=2, iterations=200))
+        with self.assertRaises(ValueError):
+            solver.score(passage, "אב")
+        print("Cipher Solver: PASS")
+
+    def test_entropy_profile(self):
+        rng = random.Random(3)
+        text = "".join(rng.choice("אבגדהו") for _ in range(200)) + "א" * 60
+        lab = EntropyLab()
+        for window, stride in ((10, 1), (25, 7), (60, 60)):
+            profile = EntropyProfile(text, window, stride)
+            values = profile.compute()
+            starts = range(0, len(text) - window + 1, stride)
+            self.assertEqual(len(values), len(starts))
+            for value, start in zip(values, starts):
+                self.assertAlmostEqual(value, lab.calculate_shannon_entropy(text[start:start + window]), places=9)
+        self.assertEqual(list(EntropyProfile("אב", 3).compute()), [])
+
+        profile = EntropyProfile(text, 25, 7)
+        summary = profile.summary(200, 260)
+        # The text ends in 60 Alephs: windows 203.. inside them have zero entropy
+        self.assertEqual((summary['windows'], summary['min_start']), (5, 203))
+        self.assertAlmostEqual(summary['min'], 0.0, places=9)
+        self.assertEqual(profile.summary()['windows'], len(profile.values))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile")
+            profile.save(path, {'corpus': "test"})
+            values, meta = EntropyProfile.load(path)
+            self.assertEqual(values, profile.values)
+            self.assertEqual((meta['window'], meta['stride'], meta['corpus']), (25, 7, "test"))
+        print("Entropy Profile: PASS")
+
+    def test_markov_entropy(self):
+        rng = random.Random(5)
+        text = "".join(rng.choice("אבגדהוםן") for _ in range(3000))
+        folded = self.tp.normalize(text, "folded")
+        lab = EntropyLab()
+
+        def block(n):
+            grams = Counter(folded[i:i + n] for i in range(len(folded) - n + 1))
+            total = sum(grams.values())
+            return -sum(c / total * math.log2(c / total) for c in grams.values())
+
+        results = lab.markov_entropies(text)
+        self.assertEqual([k for k, _, _ in results], [0, 1, 2, 3, 4, 5])
+        self.assertAlmostEqual(results[0][1], lab.calculate_shannon_entropy(folded))
+        for k, h, b in results:
+            self.assertAlmostEqual(b, block(k + 1))
+            self.assertAlmostEqual(h, block(k + 1) - (block(k) if k else 0))
+        # Letter codes (sofit flagged, as in the corpus cache) give the same numbers
+        self.assertEqual(lab.markov_entropies(self.tp.encode_letters(text), 2), results[:3])
+        # (k=5 above used the sort-based count for 6-grams, the others the dense array)
+        codes = self.tp.normalize(text, "codes_folded")
+        self.assertEqual(sorted(lab.ngram_count_values(codes, 1)), sorted(Counter(codes).values()))
+        with self.assertRaises(ValueError):
+            lab.markov_entropies(text, 6)
+        print("Markov Entropy: PASS")
+
 if __name__ == '__main__':
     # Run tests manually to print PASS clearly
     try: